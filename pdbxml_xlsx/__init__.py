@@ -0,0 +1,21 @@
+"""PDBXML battery test exports to Excel/CSV, usable without any GUI."""
+
+from .api import consolidate, convert, convert_combined, convert_many
+from .excel import write_excel
+from .journal import Journal
+from .options import Options
+from .reader import iter_tests, parse_xml
+from .warehouse import Warehouse
+
+__all__ = [
+    "Journal",
+    "Options",
+    "Warehouse",
+    "consolidate",
+    "convert",
+    "convert_combined",
+    "convert_many",
+    "iter_tests",
+    "parse_xml",
+    "write_excel",
+]
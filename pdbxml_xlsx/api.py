@@ -0,0 +1,56 @@
+from .combined import write_combined
+from .consolidate import DiskGuidSet, consolidate as consolidate_files
+from .excel import report_path
+from .options import Options
+from .pipeline import convert_file, convert_batch
+
+
+def convert(path, out=None, options=None):
+    """Converts one PDBXML/XML file to an Excel report and returns its path.
+
+    Without `out` the report is written next to the input as
+    <name>_report.xlsx.
+    """
+    options = options or Options()
+    return convert_file(path, out or report_path(path), options)
+
+
+def convert_many(paths, output_folder=None, options=None, jobs=1, journal=None, metrics=None, archive=None):
+    """Converts several files, isolating failures per file.
+
+    jobs=1 streams every file through the threaded pipeline in this
+    process; jobs>1 (or None for one per CPU) converts files in parallel
+    worker processes. Pass a BatchMetrics to collect throughput and
+    latency figures. With `archive` (a .zip path) the reports are written
+    into that one archive instead of as loose files; it cannot be used
+    with a journal. Returns (list of report paths or archive members,
+    {input: error}).
+    """
+    options = options or Options()
+    return convert_batch(list(paths), output_folder, options, journal=journal, jobs=jobs, metrics=metrics, archive=archive)
+
+
+def convert_combined(paths, output_file, options=None, jobs=1):
+    """Converts several files into one workbook, a sheet per file plus an index sheet.
+
+    jobs>1 (or None for one per CPU) parses the files in parallel worker
+    processes while this one writes the workbook. Files that fail get an
+    error row in the index instead of a sheet. Returns (output_file,
+    {input: error}).
+    """
+    return write_combined(list(paths), output_file, options, jobs)
+
+
+def consolidate(paths, output_folder, options=None, guid_db=None):
+    """Merges overlapping exports into one report per string name.
+
+    Every resultsguid is written once however many exports contain it.
+    `guid_db` keeps the seen GUIDs in an SQLite file instead of memory.
+    Returns ({string name: report path}, {input: error}).
+    """
+    seen = DiskGuidSet(guid_db) if guid_db else None
+    try:
+        return consolidate_files(list(paths), output_folder, options, seen)
+    finally:
+        if seen is not None:
+            seen.close()
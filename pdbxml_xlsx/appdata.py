@@ -0,0 +1,24 @@
+import os
+import sys
+
+APP_NAME = "pdbxml_xlsx"
+
+def app_data_dir():
+    """Per-user folder for the GUI's own files (journal, metrics), created on first use.
+
+    %LOCALAPPDATA% on Windows, ~/Library/Application Support on macOS and
+    $XDG_DATA_HOME (~/.local/share) elsewhere, so nothing but reports ends
+    up in the folders the reports are delivered from.
+    """
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser(r"~\AppData\Local")
+    elif sys.platform == "darwin":
+        base = os.path.expanduser("~/Library/Application Support")
+    else:
+        base = os.environ.get("XDG_DATA_HOME") or os.path.expanduser("~/.local/share")
+    folder = os.path.join(base, APP_NAME)
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+def app_data_path(name):
+    return os.path.join(app_data_dir(), name)
@@ -0,0 +1,35 @@
+from zipfile import ZipFile, ZIP_STORED
+
+class ReportArchive:
+    """Zip file a batch writes its reports into instead of loose files.
+
+    Reports are stored as they are: an xlsx is already deflated, so
+    compressing it again would only cost time. Workbooks saved in this
+    process are streamed straight into their member, ones rendered by
+    worker processes are added from the bytes they send back; either way
+    no temporary file is written.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.zip = ZipFile(path, "w", ZIP_STORED, allowZip64=True)
+
+    def open(self, name):
+        """Writable stream for the member `name`; close it before opening the next one."""
+        return self.zip.open(name, "w")
+
+    def write(self, name, data):
+        self.zip.writestr(name, data)
+
+    def size(self, name):
+        """Size of the member `name` once it has been written."""
+        return self.zip.getinfo(name).file_size
+
+    def close(self):
+        self.zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,207 @@
+import argparse
+import csv
+import os
+import sys
+
+from .api import convert_combined, convert_many, consolidate
+from .csv_export import write_csv
+from .excel import COMPRESSION_LEVELS
+from .filters import TestFilter
+from .journal import Journal
+from .metrics import BatchMetrics
+from .options import Options
+from .reader import BACKENDS, cross_check_backends
+from .warehouse import Warehouse
+
+
+def build_filter(args):
+    """TestFilter from the --since/--until/--guid/--form/--string options, or None."""
+    values = [getattr(args, name, None) for name in ("since", "until", "guid", "form", "string")]
+    if not any(values):
+        return None
+    return TestFilter.build(*values)
+
+
+def add_filter_arguments(parser, forms=True):
+    parser.add_argument("--since", default=None, help="Only tests on or after this date (YYYY-MM-DD)")
+    parser.add_argument("--until", default=None, help="Only tests on or before this date (YYYY-MM-DD)")
+    parser.add_argument("--guid", action="append", help="Only the test with this resultsguid (repeatable)")
+    if forms:
+        parser.add_argument("--form", action="append", help="Read the form with this name instead of the first one (repeatable)")
+    parser.add_argument("--string", action="append", help="Only tests of this string name (repeatable)")
+
+
+def add_compression_argument(parser):
+    parser.add_argument("--compression", default="default", choices=list(COMPRESSION_LEVELS), help="ZIP level of the workbooks: store and fast save quicker, max makes the smallest files (default: default)")
+
+
+def run_convert(args):
+    if args.archive and (args.journal or args.combined):
+        print("--archive cannot be used with --journal or --combined")
+        return 2
+    if args.check_backends:
+        for input_file in args.input_files:
+            cross_check_backends(input_file)
+            print(f"{input_file}: all XML backends agree")
+    options = Options(graphs=not args.no_graphs, backend=args.backend, file_jobs=args.file_jobs, test_filter=args.test_filter, compression=args.compression)
+    if args.combined:
+        output_file, failed = convert_combined(args.input_files, args.combined, options, jobs=args.jobs)
+        print(f"Saved: {output_file}")
+        for input_file, error in failed.items():
+            print(f"Error converting {input_file}: {error}")
+        return 1 if failed else 0
+    journal = Journal(args.journal) if args.journal else None
+    metrics = BatchMetrics() if args.metrics_json or args.metrics_prom else None
+    if args.output and not args.archive:
+        os.makedirs(args.output, exist_ok=True)
+    try:
+        output_files, failed = convert_many(args.input_files, args.output, options, jobs=args.jobs, journal=journal, metrics=metrics, archive=args.archive)
+    finally:
+        if journal is not None:
+            journal.close()
+    if args.metrics_json:
+        metrics.write_json(args.metrics_json)
+    if args.metrics_prom:
+        metrics.write_prometheus(args.metrics_prom)
+    for output_file in output_files:
+        print(f"Saved: {output_file}")
+    if args.archive:
+        print(f"Archive: {args.archive}")
+    for input_file, error in failed.items():
+        print(f"Error converting {input_file}: {error}")
+    return 1 if failed else 0
+
+
+def run_consolidate(args):
+    os.makedirs(args.output, exist_ok=True)
+    output_files, failed = consolidate(args.input_files, args.output, Options(graphs=not args.no_graphs, backend=args.backend, test_filter=args.test_filter, compression=args.compression), guid_db=args.guid_db)
+    for output_file in output_files.values():
+        print(f"Saved: {output_file}")
+    for input_file, error in failed.items():
+        print(f"Error reading {input_file}: {error}")
+    return 1 if failed else 0
+
+
+def run_ingest(args):
+    warehouse = Warehouse(args.database)
+    failed = 0
+    try:
+        for input_file in args.input_files:
+            try:
+                count = warehouse.ingest(input_file, Options(backend=args.backend, test_filter=args.test_filter))
+            except Exception as e:
+                print(f"Error loading {input_file}: {e}")
+                failed += 1
+            else:
+                print(f"{input_file}: {count} tests")
+    finally:
+        warehouse.close()
+    return 1 if failed else 0
+
+
+def run_export(args):
+    since = args.test_filter.since if args.test_filter else None
+    until = args.test_filter.until if args.test_filter else None
+    os.makedirs(args.output, exist_ok=True)
+    warehouse = Warehouse(args.database)
+    try:
+        output_files = warehouse.export(args.output, Options(graphs=not args.no_graphs, compression=args.compression), args.string, since, until, args.source)
+    finally:
+        warehouse.close()
+    for output_file in output_files:
+        print(f"Saved: {output_file}")
+    return 0
+
+
+def run_query(args):
+    warehouse = Warehouse(args.database)
+    try:
+        cursor = warehouse.db.execute(args.sql)
+        writer = csv.writer(sys.stdout, lineterminator="\n")
+        writer.writerow([column[0] for column in cursor.description or ()])
+        writer.writerows(cursor)
+    finally:
+        warehouse.close()
+    return 0
+
+
+def run_csv(args):
+    for input_file in args.input_files:
+        output_file = os.path.splitext(input_file)[0] + "_output.csv"
+        count = write_csv(input_file, output_file, args.encoding, args.namespace, args.schema_registry, args.test_filter)
+        print(f"{output_file}: {count} tests")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="pdbxml_xlsx", description="Convert PDBXML/XML battery test exports")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    convert = commands.add_parser("convert", help="Write an Excel report per input file")
+    convert.add_argument("input_files", nargs="+", help="XML/PDBXML files to convert")
+    convert.add_argument("-o", "--output", default=None, help="Output folder (default: next to each input)")
+    convert.add_argument("-j", "--jobs", type=int, default=1, help="Worker processes; 1 uses the in-process pipeline (default: 1)")
+    convert.add_argument("--file-jobs", type=int, default=1, help="Processes each file's tests are split over; only used with -j 1 (default: 1)")
+    convert.add_argument("--combined", default=None, metavar="FILE", help="Write every input as a sheet of this one workbook, with an index sheet (ignores -o, --journal and --metrics-*)")
+    convert.add_argument("--archive", default=None, metavar="ZIP", help="Write the reports into this one zip archive instead of as loose files (-o only names no folder then)")
+    convert.add_argument("--journal", default=None, help="SQLite journal used to resume interrupted batches")
+    convert.add_argument("--no-graphs", action="store_true", help="Do not add voltage/impedance charts")
+    convert.add_argument("--backend", default="auto", choices=["auto", *BACKENDS], help="XML reader to use (default: fastest installed)")
+    convert.add_argument("--metrics-json", default=None, help="Write throughput/latency/failure metrics of the run to this JSON file")
+    convert.add_argument("--metrics-prom", default=None, help="Write the same metrics in Prometheus text format (for the node_exporter textfile collector)")
+    convert.add_argument("--check-backends", action="store_true", help="Verify every installed XML backend reads each input identically first")
+    add_compression_argument(convert)
+    add_filter_arguments(convert)
+    convert.set_defaults(run=run_convert)
+
+    merge = commands.add_parser("consolidate", help="Merge overlapping exports into one report per string, each test once")
+    merge.add_argument("input_files", nargs="+", help="XML/PDBXML files to merge")
+    merge.add_argument("-o", "--output", required=True, help="Output folder for the per-string reports")
+    merge.add_argument("--guid-db", default=None, help="Keep seen resultsguids in this SQLite file instead of in memory")
+    merge.add_argument("--no-graphs", action="store_true", help="Do not add voltage/impedance charts")
+    merge.add_argument("--backend", default="auto", choices=["auto", *BACKENDS], help="XML reader to use (default: fastest installed)")
+    add_compression_argument(merge)
+    add_filter_arguments(merge, forms=False)
+    merge.set_defaults(run=run_consolidate)
+
+    ingest = commands.add_parser("ingest", help="Load parsed tests into a SQLite measurement warehouse")
+    ingest.add_argument("database", help="Warehouse SQLite file (created if missing)")
+    ingest.add_argument("input_files", nargs="+", help="XML/PDBXML files to load; reloading a file replaces its tests")
+    ingest.add_argument("--backend", default="auto", choices=["auto", *BACKENDS], help="XML reader to use (default: fastest installed)")
+    add_filter_arguments(ingest)
+    ingest.set_defaults(run=run_ingest)
+
+    export = commands.add_parser("export", help="Regenerate Excel reports from the warehouse, one per source file")
+    export.add_argument("database", help="Warehouse SQLite file")
+    export.add_argument("-o", "--output", required=True, help="Output folder")
+    export.add_argument("--source", default=None, help="Only the tests loaded from this file")
+    export.add_argument("--since", default=None, help="Only tests on or after this date (YYYY-MM-DD)")
+    export.add_argument("--until", default=None, help="Only tests on or before this date (YYYY-MM-DD)")
+    export.add_argument("--string", action="append", help="Only tests of this string name (repeatable)")
+    export.add_argument("--no-graphs", action="store_true", help="Do not add voltage/impedance charts")
+    add_compression_argument(export)
+    export.set_defaults(run=run_export)
+
+    query = commands.add_parser("query", help="Run an SQL query on the warehouse and print the rows as CSV")
+    query.add_argument("database", help="Warehouse SQLite file")
+    query.add_argument("sql", help="SELECT statement over the tests, fields and cells tables")
+    query.set_defaults(run=run_query)
+
+    csv_cmd = commands.add_parser("csv", help="Write one CSV row per test, with every tag and array")
+    csv_cmd.add_argument("input_files", nargs="+", help="PDBXML files to export")
+    csv_cmd.add_argument("--encoding", default=None, help="Override the encoding detected from the BOM/XML declaration")
+    csv_cmd.add_argument("--namespace", default=None, help="XML namespace of the export, if any")
+    csv_cmd.add_argument("--schema-registry", default=None, metavar="JSON", help="Remember each form's header in this file and skip the column scan when it is known (headers may then include columns from earlier files)")
+    add_filter_arguments(csv_cmd)
+    csv_cmd.set_defaults(run=run_csv)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        args.test_filter = build_filter(args)
+    except ValueError as e:
+        parser.error(str(e))
+    return args.run(args)
@@ -0,0 +1,274 @@
+import dataclasses
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+from openpyxl.utils import coordinate_to_tuple, get_column_letter
+from openpyxl.worksheet.hyperlink import Hyperlink
+
+from .consolidate import UNKNOWN_STRING, _date_key
+from .excel import type_test, start_sheet, write_test, finish_workbook, save_workbook
+from .options import Options
+from .split import parse_xml_parallel
+
+# Report written by the GUI when the inputs are combined into one workbook.
+COMBINED_NAME = "combined_report.xlsx"
+INDEX_TITLE = "Index"
+# Excel limits sheet names to 31 characters, without []:*?/\ in them.
+MAX_SHEET_NAME = 31
+UNSAFE_SHEET_NAME = re.compile(r"[\[\]:*?/\\\x00-\x1f]")
+
+INDEX_HEADERS = ["File", "Sheet", "Form", "Tests", "Status"]
+SUMMARY_HEADERS = ["String Name", "Battery Type", "Sheet", "Tests", "First Test", "Last Test", "Average Impedance (mΩ)", "Total String Voltage (V)"]
+
+class _Cell:
+    __slots__ = ("row", "column", "value", "font", "alignment")
+
+    def __init__(self, row, column, value=None):
+        self.row = row
+        self.column = column
+        self.value = value
+        self.font = None
+        self.alignment = None
+
+    @property
+    def column_letter(self):
+        return get_column_letter(self.column)
+
+class _Width:
+    __slots__ = ("width",)
+
+    def __init__(self):
+        self.width = None
+
+class _Dimensions(dict):
+    def __missing__(self, letter):
+        dimension = self[letter] = _Width()
+        return dimension
+
+class SheetBuffer:
+    """The part of an openpyxl Worksheet used by write_test and finish_workbook.
+
+    Cells are kept in a plain dict, with the same append/max_row rules as a
+    Worksheet, so a report can be laid out by the usual code and then
+    streamed into a write-only sheet, which only accepts whole rows in order.
+    """
+
+    def __init__(self, title):
+        self.title = title
+        self.cells = {}
+        self.charts = []
+        self.column_dimensions = _Dimensions()
+        self._current_row = 0
+
+    def cell(self, row, column, value=None):
+        cell = self.cells.get((row, column))
+        if cell is None:
+            cell = self.cells[(row, column)] = _Cell(row, column)
+            self._current_row = max(row, self._current_row)
+        if value is not None:
+            cell.value = value
+        return cell
+
+    def __getitem__(self, coordinate):
+        return self.cell(*coordinate_to_tuple(coordinate))
+
+    def __setitem__(self, coordinate, value):
+        self[coordinate].value = value
+
+    def append(self, values):
+        row = self._current_row + 1
+        for column, value in enumerate(values, 1):
+            self.cells[(row, column)] = _Cell(row, column, value)
+        self._current_row = row
+
+    @property
+    def max_row(self):
+        return max(row for row, column in self.cells) if self.cells else 1
+
+    @property
+    def max_column(self):
+        return max(column for row, column in self.cells) if self.cells else 1
+
+    @property
+    def columns(self):
+        max_row = self.max_row
+        for column in range(1, self.max_column + 1):
+            yield tuple(self.cell(row, column) for row in range(1, max_row + 1))
+
+    def add_chart(self, chart, anchor):
+        self.charts.append((chart, anchor))
+
+    def stream_to(self, ws):
+        """Writes the buffered widths, rows and charts into the write-only sheet ws."""
+        for letter, dimension in self.column_dimensions.items():
+            if dimension.width is not None:
+                ws.column_dimensions[letter].width = dimension.width
+        rows = {}
+        for (row, column), cell in self.cells.items():
+            rows.setdefault(row, {})[column] = cell
+        for row in range(1, self.max_row + 1):
+            cells = rows.get(row, {})
+            ws.append([_write_only(ws, cells.get(column)) for column in range(1, max(cells, default=0) + 1)])
+        for chart, anchor in self.charts:
+            ws.add_chart(chart, anchor)
+
+def _write_only(ws, cell):
+    if cell is None or (cell.font is None and cell.alignment is None):
+        return None if cell is None else cell.value
+    out = WriteOnlyCell(ws, cell.value)
+    if cell.font is not None:
+        out.font = cell.font
+    if cell.alignment is not None:
+        out.alignment = cell.alignment
+    return out
+
+def sheet_title(input_file, used):
+    """A valid sheet name for input_file, not yet in used (compared case-insensitively), which it is added to."""
+    base = UNSAFE_SHEET_NAME.sub("_", os.path.splitext(os.path.basename(input_file))[0]).strip("'") or "Report"
+    title = base[:MAX_SHEET_NAME]
+    number = 1
+    while title.lower() in used:
+        number += 1
+        suffix = f" ({number})"
+        title = base[:MAX_SHEET_NAME - len(suffix)] + suffix
+    used.add(title.lower())
+    return title
+
+def read_report(input_file, options):
+    """Parses and types every test of input_file; the unit of work of the combined writer's pool."""
+    formname, all_tests = parse_xml_parallel(input_file, options.file_jobs, options.backend, options.encoding, options.test_filter)
+    return formname, [type_test(test) for test in all_tests]
+
+def _summaries(title, typed_tests):
+    """One index row per string name of a sheet, with the figures of its latest test."""
+    strings = {}
+    for typed_test in typed_tests:
+        stringname = dict(typed_test[2])
+        strings.setdefault(stringname.get("String Name") or UNKNOWN_STRING, []).append((typed_test, stringname))
+    rows = []
+    for name, entries in strings.items():
+        entries.sort(key=lambda entry: _date_key(entry[0]))
+        latest, stringname = entries[-1]
+        summary = dict(latest[5])
+        rows.append([
+            name,
+            stringname.get("Battery Type"),
+            title,
+            len(entries),
+            dict(entries[0][0][0]).get("Test Date"),
+            dict(latest[0]).get("Test Date"),
+            summary.get("Average Impedance (mΩ)"),
+            summary.get("Total String Voltage (V)"),
+        ])
+    return rows
+
+def _results(input_files, options, jobs):
+    """Yields (input file, (formname, typed tests) or exception) in input order.
+
+    With jobs > 1 the files are read by a process pool, at most 2 * jobs
+    ahead of the writer, so only that many parsed files are held at once.
+    """
+    if jobs == 1:
+        for input_file in input_files:
+            try:
+                yield input_file, read_report(input_file, options)
+            except Exception as e:
+                yield input_file, e
+        return
+    # Every worker already reads a whole file; don't split files over more processes.
+    options = dataclasses.replace(options, file_jobs=1)
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        pending = []
+        for input_file in input_files:
+            pending.append((input_file, pool.submit(read_report, input_file, options)))
+            if len(pending) >= 2 * jobs:
+                yield _result(*pending.pop(0))
+        while pending:
+            yield _result(*pending.pop(0))
+
+def _result(input_file, future):
+    try:
+        return input_file, future.result()
+    except Exception as e:
+        return input_file, e
+
+def _index_rows(files, summaries):
+    bold = lambda value: ("bold", value)
+    rows = [[bold("Battery Test Reports")], []]
+    rows.append([bold(header) for header in INDEX_HEADERS])
+    rows.extend(files)
+    rows.append([])
+    rows.append([bold("String Summary")])
+    rows.append([bold(header) for header in SUMMARY_HEADERS])
+    rows.extend(summaries)
+    return rows
+
+def _write_index(ws, rows):
+    """Streams the index rows into ws: ("bold", text) is a bold cell, ("link", title) a link to that sheet."""
+    widths = {}
+    for row in rows:
+        for column, value in enumerate(row, 1):
+            text = value[1] if isinstance(value, tuple) else value
+            widths[column] = max(widths.get(column, 0), len(str(text)) if text else 0)
+    for column, width in widths.items():
+        ws.column_dimensions[get_column_letter(column)].width = width + 2
+    bold_font = Font(bold=True)
+    link_font = Font(color="0563C1", underline="single")
+    for row in rows:
+        values = []
+        for value in row:
+            if isinstance(value, tuple):
+                kind, text = value
+                cell = WriteOnlyCell(ws, text)
+                if kind == "bold":
+                    cell.font = bold_font
+                else:
+                    cell.hyperlink = Hyperlink(ref="", location="'{}'!A1".format(text.replace("'", "''")), display=text)
+                    cell.font = link_font
+                value = cell
+            values.append(value)
+        ws.append(values)
+
+def write_combined(input_files, output_file, options=None, jobs=1):
+    """Writes the reports of input_files as the sheets of one workbook.
+
+    Each input gets a sheet laid out like its own report would be, named
+    after the file. The first sheet is an index linking to every sheet,
+    with the outcome of each file and a row per string name summarising
+    its latest test. The workbook is write-only, so a sheet's cells are
+    released once it has been streamed out; with jobs > 1 the inputs are
+    parsed by that many processes while this one writes.
+
+    Returns (output_file, {input file: error message}).
+    """
+    options = options or Options()
+    jobs = jobs or os.cpu_count() or 1
+    wb = Workbook(write_only=True)
+    index = wb.create_sheet(INDEX_TITLE)
+    used = {INDEX_TITLE.lower()}
+    files = []
+    summaries = []
+    failed = {}
+    for input_file, result in _results(input_files, options, jobs):
+        name = os.path.basename(input_file)
+        if isinstance(result, Exception):
+            failed[input_file] = str(result)
+            files.append([name, None, None, None, f"Error: {result}"])
+            continue
+        formname, typed_tests = result
+        title = sheet_title(input_file, used)
+        buffer = SheetBuffer(title)
+        start_sheet(buffer)
+        for typed_test in typed_tests:
+            write_test(buffer, typed_test, options.graphs)
+        finish_workbook(buffer, formname, len(typed_tests))
+        buffer.stream_to(wb.create_sheet(title))
+        files.append([name, ("link", title), formname, len(typed_tests), "OK"])
+        summaries.extend([row[0], row[1], ("link", row[2]), *row[3:]] for row in _summaries(title, typed_tests))
+    _write_index(index, _index_rows(files, summaries))
+    save_workbook(wb, output_file, options.compression)
+    return output_file, failed
@@ -0,0 +1,201 @@
+import hashlib
+import os
+import pickle
+import re
+import sqlite3
+import tempfile
+from datetime import datetime
+
+from .excel import type_test, new_workbook, write_test, finish_workbook, save_workbook
+from .filters import TEST_DATE_FORMATS, TestFilter, _parse_date
+from .options import Options
+from .reader import iter_fragment, iter_tests
+from .source import MappedSource
+
+UNKNOWN_STRING = "Unknown String"
+UNSAFE_FILENAME = re.compile(r'[<>:"/\\|?*\x00-\x1f]')
+
+def guid_key(guid):
+    """Compact fixed-size key for a resultsguid (8 bytes instead of a full string)."""
+    return hashlib.blake2b(guid.encode("utf-8"), digest_size=8).digest()
+
+class GuidSet:
+    """In-memory set of the resultsguids already consolidated."""
+
+    def __init__(self):
+        self.keys = set()
+
+    def __contains__(self, guid):
+        return guid_key(guid) in self.keys
+
+    def update(self, guids):
+        self.keys.update(guid_key(guid) for guid in guids)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def close(self):
+        pass
+
+class DiskGuidSet:
+    """SQLite-backed GuidSet for archives with more tests than fit in memory."""
+
+    def __init__(self, path):
+        self.db = sqlite3.connect(path)
+        self.db.execute("CREATE TABLE IF NOT EXISTS guids (key BLOB PRIMARY KEY) WITHOUT ROWID")
+        self.db.commit()
+
+    def __contains__(self, guid):
+        return self.db.execute("SELECT 1 FROM guids WHERE key = ?", (guid_key(guid),)).fetchone() is not None
+
+    def update(self, guids):
+        self.db.executemany("INSERT OR IGNORE INTO guids (key) VALUES (?)", ((guid_key(guid),) for guid in guids))
+        self.db.commit()
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM guids").fetchone()[0]
+
+    def close(self):
+        self.db.close()
+
+class StringSpool:
+    """Typed tests waiting to be written, per string name, in a temporary SQLite file.
+
+    Consolidation can only write a string's report once every export has
+    been read, so the tests are kept on disk until then rather than in
+    memory. The file is deleted on close().
+    """
+
+    def __init__(self, folder=None):
+        handle, self.path = tempfile.mkstemp(prefix="pdbxml_spool_", suffix=".sqlite", dir=folder)
+        os.close(handle)
+        self.db = sqlite3.connect(self.path)
+        self.db.execute("CREATE TABLE tests (string TEXT, undated INTEGER, date_key TEXT, data BLOB)")
+        self.db.execute("CREATE INDEX tests_string ON tests (string, undated, date_key)")
+
+    def add(self, entries):
+        """Stores (string name, typed test) pairs."""
+        rows = []
+        for name, typed_test in entries:
+            undated, when = _date_key(typed_test)
+            date_key = when.isoformat() if isinstance(when, datetime) else when
+            rows.append((name, undated, date_key, pickle.dumps(typed_test, pickle.HIGHEST_PROTOCOL)))
+        self.db.executemany("INSERT INTO tests (string, undated, date_key, data) VALUES (?, ?, ?, ?)", rows)
+        self.db.commit()
+
+    def tests(self, name):
+        """Yields the typed tests of a string name in date order (undated last, ties as added)."""
+        query = "SELECT data FROM tests WHERE string = ? ORDER BY undated, date_key, rowid"
+        for (data,) in self.db.execute(query, (name,)):
+            yield pickle.loads(data)
+
+    def close(self):
+        self.db.close()
+        os.remove(self.path)
+
+def unique_tests(source, ranges, seen, test_filter=None):
+    """Returns the byte ranges and GUIDs of the tests at ranges not yet in seen.
+
+    Only the <test> start tags are decoded, so duplicates are dropped before
+    any parsing. Tests without a resultsguid are always kept.
+    """
+    test_filter = test_filter or TestFilter()
+    unique = []
+    guids = set()
+    for start, end in ranges:
+        attributes = source.start_tag_attributes(start)
+        guid = attributes.get("resultsguid")
+        if not test_filter.accepts_test(attributes.get("date"), guid):
+            continue
+        if guid:
+            if guid in guids or guid in seen:
+                continue
+            guids.add(guid)
+        unique.append((start, end))
+    return unique, guids
+
+def string_filename(name, used=None):
+    """Turns a string name into a safe report file name.
+
+    With a set `used`, names already in it (compared case-insensitively, as
+    on Windows and macOS) get a " (2)", " (3)"... suffix, and the result is
+    added to it.
+    """
+    base = UNSAFE_FILENAME.sub("_", name or "").strip(" .") or UNKNOWN_STRING
+    filename = f"{base}_report.xlsx"
+    if used is None:
+        return filename
+    number = 1
+    while filename.lower() in used:
+        number += 1
+        filename = f"{base} ({number})_report.xlsx"
+    used.add(filename.lower())
+    return filename
+
+def _date_key(typed_test):
+    date = dict(typed_test[0]).get("Test Date")
+    when = _parse_date(date or "", TEST_DATE_FORMATS)
+    return (when is None, when or date or "")
+
+def consolidate(input_files, output_folder, options=None, seen=None):
+    """Merges the unique tests of input_files into one workbook per string name.
+
+    Tests are identified by resultsguid across the whole batch: a test found
+    in several exports is parsed and written once. Each string's tests are
+    written in date order to <output_folder>/<string name>_report.xlsx.
+    Until then they wait in a StringSpool on disk, so memory holds one
+    export's tests at a time. `seen` may be a DiskGuidSet for very large
+    archives; by default the GUIDs are kept in memory.
+
+    Returns ({string name: report path}, {input file: error message}).
+    """
+    options = options or Options()
+    if options.test_filter is not None and options.test_filter.forms is not None:
+        raise ValueError("Consolidation reads the first form of each export; form filters are not supported")
+    seen = GuidSet() if seen is None else seen
+    spool = StringSpool()
+    try:
+        return _consolidate(input_files, output_folder, options, seen, spool)
+    finally:
+        spool.close()
+
+def _consolidate(input_files, output_folder, options, seen, spool):
+    formnames = {}
+    failed = {}
+    for input_file in input_files:
+        try:
+            with MappedSource(input_file) as source:
+                ranges = source.first_form_test_ranges()
+                unique, guids = unique_tests(source, ranges, seen, options.test_filter)
+                if unique:
+                    tests = list(iter_fragment(source, unique, options.backend, options.encoding, options.test_filter))
+            if not ranges:
+                # Nothing found by the byte scan: parse the file itself so
+                # that malformed input is reported rather than skipped.
+                tests = list(iter_tests(input_file, options.backend, options.encoding, options.test_filter))
+            elif not unique:
+                continue
+        except Exception as e:
+            failed[input_file] = str(e)
+            continue
+        seen.update(guids)
+        entries = []
+        for formname, test in tests:
+            name = test[2].get("String Name") or UNKNOWN_STRING
+            formnames[name] = formname
+            entries.append((name, type_test(test)))
+        spool.add(entries)
+
+    output_files = {}
+    used = set()
+    for name, formname in formnames.items():
+        wb, ws = new_workbook()
+        num_tests = 0
+        for typed_test in spool.tests(name):
+            write_test(ws, typed_test, options.graphs)
+            num_tests += 1
+        finish_workbook(ws, formname, num_tests)
+        output_file = os.path.join(output_folder, string_filename(name, used))
+        save_workbook(wb, output_file, options.compression)
+        output_files[name] = output_file
+    return output_files, failed
@@ -0,0 +1,222 @@
+import xml.etree.ElementTree as ET
+import csv
+import json
+import os
+from xml.parsers import expat
+
+from .filters import TestFilter
+from .names import lower_name, shared_name
+from .source import MappedSource
+
+BASE_COLUMNS = ["form_name", "test_date", "resultsguid"]
+
+class SchemaMismatch(Exception):
+    """A test has a column that is not in the header being written."""
+
+# Function to read the string name from the nameplate of a test element
+def string_name(test, prefix=""):
+    name = None
+    for nameplate in test.findall(prefix + "nameplate"):
+        for tag in nameplate.findall(prefix + "tag"):
+            if lower_name(tag.get("name", "")) == "stringname":
+                name = tag.text
+                break
+    return name
+
+# Function to stream (form_name, test element) pairs out of the XML, skipping
+# forms and tests rejected by the filter as soon as their attributes are seen
+def iter_test_elements(file_name, encoding=None, namespace=None, test_filter=None):
+    prefix = "{%s}" % namespace if namespace else ""
+    form_tag, test_tag = prefix + "form", prefix + "test"
+    test_filter = test_filter or TestFilter()
+    parser = ET.XMLParser(target=ET.TreeBuilder(), encoding=encoding) if encoding else None
+    depth = 0
+    form_name = None
+    in_form = True
+    wanted = True
+    with MappedSource(file_name) as source:
+        for event, elem in ET.iterparse(source, events=("start", "end"), parser=parser):
+            if event == "start":
+                depth += 1
+                if depth == 2 and elem.tag == form_tag:
+                    form_name = elem.get("name")
+                    in_form = test_filter.accepts_form(form_name)
+                elif depth == 3 and elem.tag == test_tag:
+                    wanted = in_form and test_filter.accepts_test(elem.get("date"), elem.get("resultsguid"))
+                continue
+            depth -= 1
+            if depth == 2 and elem.tag == test_tag:
+                if wanted and test_filter.accepts_string(string_name(elem, prefix)):
+                    yield form_name, elem
+                elem.clear()
+
+# Function to read the name of the first form without parsing any tests
+def first_form_name(file_name, encoding=None, namespace=None):
+    prefix = "{%s}" % namespace if namespace else ""
+    parser = ET.XMLParser(target=ET.TreeBuilder(), encoding=encoding) if encoding else None
+    with MappedSource(file_name) as source:
+        for event, elem in ET.iterparse(source, events=("start",), parser=parser):
+            if elem.tag == prefix + "form":
+                return elem.get("name")
+    return None
+
+# Function to turn one test element into a CSV row
+def test_row(form_name, test, namespace=None):
+    prefix = "{%s}" % namespace if namespace else ""
+    row = {
+        "form_name": form_name,
+        "test_date": test.get("date"),
+        "resultsguid": test.get("resultsguid"),
+    }
+    data = test.find(prefix + "data")
+    for tag in data.findall(prefix + "tag"):
+        row[shared_name(tag.get("name"))] = tag.text if tag.text is not None else ""
+    for array in data.findall(prefix + "array"):
+        row[shared_name(array.get("name"))] = ", ".join(
+            item.text for item in array.findall(prefix + "arrayitem") if item.text is not None
+        )
+    return row
+
+# Function to parse XML and extract data into a list of rows
+def parse_pdbxml(file_name, encoding=None, namespace=None, test_filter=None):
+    return [test_row(form_name, test, namespace) for form_name, test in iter_test_elements(file_name, encoding, namespace, test_filter)]
+
+# Parser callbacks collecting the columns test_row would give the tests the
+# filter accepts: the names of the tags, then of the arrays, of each test's
+# first <data>. Only start tags and the string name are looked at; no tree is
+# built, and character data is only handed over while the string name is
+# read. Names are matched as "{namespace}local", like ElementTree's
+class _SchemaScanner:
+    def __init__(self, parser, prefix, test_filter):
+        self.parser = parser
+        self.form_tag, self.test_tag, self.data_tag = prefix + "form", prefix + "test", prefix + "data"
+        self.tag_tag, self.array_tag, self.nameplate_tag = prefix + "tag", prefix + "array", prefix + "nameplate"
+        self.test_filter = test_filter
+        self.columns = dict.fromkeys(BASE_COLUMNS)
+        self.form_names = []
+        self.depth = 0
+        self.form_name = None
+        self.in_form = True
+        self.test = None
+        self.section = None
+        self.stringname_seen = False
+        self.text = None
+
+    def start(self, name, attrs):
+        depth = self.depth = self.depth + 1
+        if depth > 5:
+            return
+        if depth == 2 and name == self.form_tag:
+            self.form_name = attrs.get("name")
+            self.in_form = self.test_filter.accepts_form(self.form_name)
+        elif depth == 3 and name == self.test_tag:
+            if self.in_form and self.test_filter.accepts_test(attrs.get("date"), attrs.get("resultsguid")):
+                # Tag names, array names, string name, whether a <data> was seen
+                self.test = [[], [], None, False]
+        elif self.test is None:
+            return
+        elif depth == 4:
+            self.section = name
+            if name == self.data_tag:
+                self.section = None if self.test[3] else name
+                self.test[3] = True
+            elif name == self.nameplate_tag:
+                self.stringname_seen = False
+        elif depth == 5 and self.section == self.data_tag:
+            if name == self.tag_tag:
+                self.test[0].append(shared_name(attrs.get("name")))
+            elif name == self.array_tag:
+                self.test[1].append(shared_name(attrs.get("name")))
+        elif depth == 5 and self.section == self.nameplate_tag and name == self.tag_tag:
+            if not self.stringname_seen and lower_name(attrs.get("name", "")) == "stringname":
+                self.stringname_seen = True
+                self.text = []
+                self.parser.CharacterDataHandler = self.text.append
+
+    def end(self, name):
+        depth = self.depth
+        self.depth = depth - 1
+        if depth > 5:
+            return
+        if self.text is not None and depth == 5:
+            self.parser.CharacterDataHandler = None
+            self.test[2] = "".join(self.text) or None
+            self.text = None
+        elif depth == 3 and self.test is not None:
+            tags, arrays, stringname, _ = self.test
+            self.test = None
+            if self.test_filter.accepts_string(stringname):
+                if self.form_name not in self.form_names:
+                    self.form_names.append(self.form_name)
+                for column in tags + arrays:
+                    self.columns.setdefault(column)
+
+# Function to collect the CSV header of a file without building any rows
+def scan_schema(file_name, encoding=None, namespace=None, test_filter=None, chunk_size=64 * 1024):
+    parser = expat.ParserCreate(encoding, namespace_separator="}")
+    parser.buffer_text = True
+    scanner = _SchemaScanner(parser, "%s}" % namespace if namespace else "", test_filter or TestFilter())
+    parser.StartElementHandler = scanner.start
+    parser.EndElementHandler = scanner.end
+    with MappedSource(file_name) as source:
+        try:
+            while True:
+                chunk = source.read(chunk_size)
+                parser.Parse(chunk, not chunk)
+                if not chunk:
+                    break
+        except expat.ExpatError as e:
+            raise ET.ParseError(str(e)) from None
+    return scanner.form_names, list(scanner.columns)
+
+# A schema registry is a JSON file of known CSV headers per form name, reused
+# so that a file can be written in a single pass instead of being scanned for
+# its columns first. It is only used when a path is given.
+def load_registry(registry_path):
+    try:
+        with open(registry_path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_registry(registry, registry_path):
+    try:
+        with open(registry_path, "w", encoding="utf-8") as f:
+            json.dump(registry, f, indent=1)
+    except OSError:
+        pass
+
+# Function to stream the rows of a file into a CSV under a fixed header
+def write_rows(file_name, output_file, columns, encoding=None, namespace=None, test_filter=None):
+    with open(output_file, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=columns, restval="", extrasaction="raise", lineterminator=os.linesep)
+        writer.writeheader()
+        count = 0
+        for form_name, test in iter_test_elements(file_name, encoding, namespace, test_filter):
+            try:
+                writer.writerow(test_row(form_name, test, namespace))
+            except ValueError as e:
+                raise SchemaMismatch(str(e))
+            count += 1
+    return count
+
+# Function to write the CSV one test at a time, with the header taken from a
+# first-pass scan. With a registry_path, a header remembered for the form is
+# used instead, saving the scan; it may then hold columns seen in earlier
+# files of that form, so the output is no longer determined by the file alone
+def write_csv(file_name, output_file, encoding=None, namespace=None, registry_path=None, test_filter=None):
+    registry = load_registry(registry_path) if registry_path else {}
+    columns = registry.get(str(first_form_name(file_name, encoding, namespace)))
+    if columns:
+        try:
+            return write_rows(file_name, output_file, columns, encoding, namespace, test_filter)
+        except SchemaMismatch:
+            pass
+
+    form_names, columns = scan_schema(file_name, encoding, namespace, test_filter)
+    count = write_rows(file_name, output_file, columns, encoding, namespace, test_filter)
+    # A filtered scan may have missed columns, so only full scans are remembered
+    if registry_path and test_filter is None and len(form_names) == 1:
+        registry[str(form_names[0])] = columns
+        save_registry(registry, registry_path)
+    return count
@@ -0,0 +1,211 @@
+import os
+from datetime import datetime, timezone
+from zipfile import ZipFile, ZIP_DEFLATED, ZIP_STORED
+from openpyxl import Workbook
+from openpyxl.styles import Font, Alignment
+from openpyxl.chart import LineChart, Reference
+from openpyxl.writer.excel import ExcelWriter
+
+from .names import lower_name
+
+# ZIP method and level of the parts of a saved workbook, by Options.compression.
+# "default" is what openpyxl's own save uses.
+COMPRESSION_LEVELS = {
+    "store": (ZIP_STORED, None),
+    "fast": (ZIP_DEFLATED, 1),
+    "default": (ZIP_DEFLATED, None),
+    "max": (ZIP_DEFLATED, 9),
+}
+
+def convert_to_number(value):
+    """Converts a string to a number (int or float) if possible, otherwise returns the original string."""
+    try:
+        if "." in value: 
+            return float(value)
+        return int(value)  
+    except (ValueError, TypeError):
+        return value 
+
+def round_to_sig_figs(value, sig_figs=3):
+    """Rounds a number to a specified number of significant figures."""
+    try:
+        num = float(value)
+        if num == 0:
+            return "0"  
+        return f"{num:.{sig_figs}g}" 
+    except ValueError:
+        return value
+
+
+def type_test(test):
+    """Converts the raw text of a parsed test into the values written to the sheet."""
+    general_info, cell_data, stringname, jarcells, deviation, tablesummary, baseline = test
+
+    general_info = [
+        (key, convert_to_number(value) if key == "Ambient Temp. (°C)" else value)
+        for key, value in general_info.items()
+    ]
+    jarcells = [(key, convert_to_number(value)) for key, value in jarcells.items()]
+    deviation = [(key, convert_to_number(round_to_sig_figs(value, 5))) for key, value in deviation.items()]
+    tablesummary = [(key, convert_to_number(round_to_sig_figs(value, 5))) for key, value in tablesummary.items()]
+    baseline = convert_to_number(baseline)
+
+    rows = []
+    for row in cell_data:
+        row = {lower_name(k): v for k, v in row.items()}
+        rows.append([
+            convert_to_number(row.get("cell no", "")),
+            convert_to_number(row.get("impedence", "")),
+            convert_to_number(row.get("v", "")),
+            convert_to_number(row.get("d", "")),
+            convert_to_number(row.get("voltage", "")),
+            row.get("time", ""),
+            convert_to_number(row.get("tem_1", ""))
+        ])
+
+    return general_info, rows, list(stringname.items()), jarcells, deviation, tablesummary, baseline
+
+def start_sheet(ws):
+    """Writes the title row every report sheet starts with."""
+    ws["A1"] = "Battery Test Report"
+    ws["A1"].font = Font(bold=True)
+    ws.append([])
+
+def new_workbook():
+    """Creates the report workbook and its title row."""
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Battery Test"
+    start_sheet(ws)
+    return wb, ws
+
+def write_test(ws, typed_test, graph_bool):
+    """Appends one test, as returned by type_test, below the current content of ws."""
+    general_info, rows, stringname, jarcells, deviation, tablesummary, baseline = typed_test
+    bold_font = Font(bold=True)
+    center_align = Alignment(horizontal="center")
+
+    current_row = ws.max_row + 2
+    for i, (key, value) in enumerate(general_info):
+        key_cell = ws.cell(row=current_row + i, column=1, value=key)
+        key_cell.font = bold_font
+        ws.cell(row=current_row + i, column=2, value=value)    
+    for i, (key, value) in enumerate(stringname):
+        key_cell = ws.cell(row=current_row + 2 + i, column=1, value=key)
+        key_cell.font = bold_font
+        ws.cell(row=current_row + 2 + i, column=2, value=value)
+    for i, (key, value) in enumerate(jarcells):
+        key_cell = ws.cell(row=current_row + i, column=3, value=key)
+        key_cell.font = bold_font
+        ws.cell(row=current_row + i, column=4, value=value)
+
+    ws.append([])
+
+    current_row = ws.max_row + 2
+
+    for i, (key, value) in enumerate(deviation):
+        if i < 2:
+            key_cell = ws.cell(row=current_row + i, column=1, value=key)
+            key_cell.font = bold_font
+            ws.cell(row=current_row + i, column=2, value=value)
+        else:
+            key_cell = ws.cell(row=current_row + i -2, column=3, value=key)
+            key_cell.font = bold_font
+            ws.cell(row=current_row + i-2, column=4, value=value)
+            
+    ws.append([])
+    ws.append(["Table Summary"])
+    ws["A{}".format(ws.max_row)].font = bold_font
+    current_row = ws.max_row + 1
+    key_cell = ws.cell(row=current_row, column=1, value="Baseline Impedance (mΩ)")
+    key_cell.font = bold_font
+    ws.cell(row=current_row +1, column=1, value=baseline)
+    
+    for i, (key, value) in enumerate(tablesummary):
+        key_cell = ws.cell(row=current_row, column=2 + i, value=key)
+        key_cell.font = bold_font
+        key_cell.alignment = center_align
+        ws.cell(row=current_row + 1, column=2 + i, value=value)
+
+
+    ws.append([])
+
+    headers = ["Cell No.", "Impedance (mΩ)", "% Deviation (Baseline)", "% Variation (String)", "Voltage (V)", "Time", "Temperature (°C)"]
+    ws.append(headers)
+
+    for col in ["A", "B", "C", "D", "E", "F", "G"]:
+        ws["{}{}".format(col, ws.max_row)].font = bold_font
+        ws["{}{}".format(col, ws.max_row)].alignment = center_align
+
+    for row in rows:
+        ws.append(row)
+
+    if graph_bool:
+        voltageChart = LineChart()
+        voltageChart.title = "Voltage Graph"
+        voltageChart.x_axis.title = "Cell Number"
+        voltageChart.y_axis.title = "Voltage (V)"
+        voltageChart.legend = None
+        impedanceChart = LineChart()
+        impedanceChart.title = "Impedance Graph"
+        impedanceChart.x_axis.title = "Cell Number"
+        impedanceChart.y_axis.title = "Impedance (mΩ)"
+        impedanceChart.legend = None
+
+        start_row = ws.max_row - len(rows) + 1  
+        end_row = ws.max_row
+        graph_row = start_row
+        graph_col1 = "J"
+        graph_col2 = "T"
+
+        x_values = Reference(ws, min_col=1, min_row=start_row, max_row=end_row)  
+        yVoltage_values = Reference(ws, min_col=5, min_row=start_row, max_row=end_row)  
+        yImpedance_values = Reference(ws, min_col=2, min_row=start_row, max_row=end_row) 
+
+        voltageChart.add_data(yVoltage_values, titles_from_data=True)
+        voltageChart.set_categories(x_values)
+        impedanceChart.add_data(yImpedance_values, titles_from_data=True)
+        impedanceChart.set_categories(x_values)
+
+        ws.add_chart(impedanceChart, f"{graph_col1}{graph_row}")
+        ws.add_chart(voltageChart, f"{graph_col2}{graph_row}")
+
+def finish_workbook(ws, formname, num_tests):
+    """Sets the report title and sizes the columns once every test has been written."""
+    if formname != "":
+        ws["A1"] = formname
+    if num_tests:
+        for col in ws.columns:
+            max_length = max(len(str(cell.value)) if cell.value else 0 for cell in col)
+            ws.column_dimensions[col[0].column_letter].width = max_length + 2
+
+def save_workbook(wb, output_file, compression="default"):
+    """wb.save(output_file) with the ZIP compression named by `compression` (see COMPRESSION_LEVELS).
+
+    output_file may be a path or a writable file object, which does not
+    have to be seekable, such as a member of a ReportArchive.
+    """
+    method, level = COMPRESSION_LEVELS[compression]
+    if wb.write_only and not wb.worksheets:
+        wb.create_sheet()
+    wb.properties.modified = datetime.now(timezone.utc).replace(tzinfo=None)
+    with ZipFile(output_file, "w", method, allowZip64=True, compresslevel=level) as archive:
+        ExcelWriter(wb, archive).write_data()
+
+def write_excel(formname, all_tests, graph_bool, output_file, compression="default"):
+    """Writes extracted data into a well-structured Excel (.xlsx) file."""
+    wb, ws = new_workbook()
+    for test in all_tests:
+        write_test(ws, type_test(test), graph_bool)
+    finish_workbook(ws, formname, len(all_tests))
+    save_workbook(wb, output_file, compression)
+
+def report_path(input_file, output_folder=None):
+    """Returns the path of the report written for input_file.
+
+    Without an output folder the report is written next to the input.
+    """
+    if output_folder is None:
+        output_folder = os.path.dirname(input_file)
+    filename = os.path.basename(input_file).replace(".xml", "").replace(".pdbxml", "")
+    return os.path.join(output_folder, f"{filename}_report.xlsx")
@@ -0,0 +1,79 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import FrozenSet, Optional
+
+# Layouts of the <test date="..."> attribute written by PowerDB.
+TEST_DATE_FORMATS = ("%m/%d/%Y %H:%M:%S", "%m/%d/%Y %H:%M", "%m/%d/%Y")
+# Layouts accepted for --since/--until.
+FILTER_DATE_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d", *TEST_DATE_FORMATS)
+
+
+def _parse_date(text, formats):
+    for fmt in formats:
+        try:
+            return datetime.strptime(text.strip(), fmt)
+        except ValueError:
+            pass
+    return None
+
+
+def parse_filter_date(text):
+    """Parses a --since/--until value, raising ValueError for unknown layouts."""
+    value = _parse_date(text, FILTER_DATE_FORMATS)
+    if value is None:
+        raise ValueError(f"Unrecognised date '{text}' (use YYYY-MM-DD)")
+    return value
+
+
+def _names(values):
+    return frozenset(value.casefold() for value in values) if values else None
+
+
+@dataclass(frozen=True)
+class TestFilter:
+    """Selects which tests are read, checked as early as the data allows.
+
+    Forms are matched on <form name>, and tests on their date and
+    resultsguid attributes before anything inside them is looked at. String
+    names live in the nameplate section, so they are checked once the
+    sections are read but before any array is turned into cells. Names
+    and GUIDs are compared case-insensitively; `until` is inclusive.
+    """
+
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
+    guids: Optional[FrozenSet[str]] = None
+    forms: Optional[FrozenSet[str]] = None
+    strings: Optional[FrozenSet[str]] = None
+
+    @classmethod
+    def build(cls, since=None, until=None, guids=None, forms=None, strings=None):
+        """Creates a filter from plain values, parsing dates and normalising names."""
+        if isinstance(since, str):
+            since = parse_filter_date(since)
+        if isinstance(until, str):
+            date_only = ":" not in until
+            until = parse_filter_date(until)
+            if date_only:
+                until = until.replace(hour=23, minute=59, second=59)
+        return cls(since, until, _names(guids), _names(forms), _names(strings))
+
+    def accepts_form(self, name):
+        return self.forms is None or (name or "").casefold() in self.forms
+
+    def accepts_test(self, date, resultsguid):
+        if self.guids is not None and (resultsguid or "").casefold() not in self.guids:
+            return False
+        if self.since is None and self.until is None:
+            return True
+        when = _parse_date(date or "", TEST_DATE_FORMATS)
+        if when is None:
+            return False
+        if self.since is not None and when < self.since:
+            return False
+        if self.until is not None and when > self.until:
+            return False
+        return True
+
+    def accepts_string(self, name):
+        return self.strings is None or (name or "").casefold() in self.strings
@@ -0,0 +1,95 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+JOURNAL_NAME = "pdbxml_journal.sqlite"
+
+def file_digest(path, chunk_size=1024 * 1024):
+    """Returns the SHA-256 hex digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def options_key(options):
+    """The conversion settings a report depends on, as the text stored with it in the journal."""
+    test_filter = options.test_filter
+    filter_key = None
+    if test_filter is not None:
+        filter_key = {
+            "since": test_filter.since.isoformat() if test_filter.since else None,
+            "until": test_filter.until.isoformat() if test_filter.until else None,
+            "guids": sorted(test_filter.guids) if test_filter.guids is not None else None,
+            "forms": sorted(test_filter.forms) if test_filter.forms is not None else None,
+            "strings": sorted(test_filter.strings) if test_filter.strings is not None else None,
+        }
+    return json.dumps({
+        "graphs": options.graphs,
+        "backend": options.backend,
+        "encoding": options.encoding,
+        "compression": options.compression,
+        "filter": filter_key,
+    }, sort_keys=True)
+
+class Journal:
+    """Records the outcome of every input of a batch run in a SQLite file.
+
+    Each input is keyed by its absolute path and remembers the hash it had
+    when it was last converted, where its report went and the options_key
+    of the settings used, so a restarted run can skip inputs whose report
+    is already on disk, where this run would write it, made with the same
+    settings from the same content.
+    Every record is committed immediately, which keeps the journal usable
+    after a crash.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            " input_path TEXT PRIMARY KEY,"
+            " sha256 TEXT,"
+            " output_path TEXT,"
+            " status TEXT,"
+            " attempts INTEGER DEFAULT 0,"
+            " error TEXT,"
+            " updated REAL,"
+            " settings TEXT)"
+        )
+        # Journals written before settings were recorded: their rows never match.
+        columns = [row[1] for row in self.db.execute("PRAGMA table_info(files)")]
+        if "settings" not in columns:
+            self.db.execute("ALTER TABLE files ADD COLUMN settings TEXT")
+        self.db.commit()
+
+    def is_done(self, input_file, digest, output_file, settings):
+        """True if input_file was converted with this content and settings to output_file, which still exists."""
+        row = self.db.execute(
+            "SELECT sha256, output_path, status, settings FROM files WHERE input_path = ?",
+            (os.path.abspath(input_file),),
+        ).fetchone()
+        return (
+            row is not None and row[2] == "done" and row[0] == digest and row[3] == settings
+            and row[1] == os.path.abspath(output_file) and os.path.exists(row[1])
+        )
+
+    def record(self, input_file, digest, output_file, status, error=None, settings=None):
+        """Stores the latest status of input_file, counting failed attempts."""
+        input_path = os.path.abspath(input_file)
+        self.db.execute(
+            "INSERT INTO files (input_path, sha256, output_path, status, attempts, error, updated, settings)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+            " ON CONFLICT(input_path) DO UPDATE SET"
+            " sha256 = excluded.sha256, output_path = excluded.output_path, status = excluded.status,"
+            " attempts = CASE WHEN files.sha256 IS excluded.sha256 THEN files.attempts + excluded.attempts ELSE excluded.attempts END,"
+            " error = excluded.error, updated = excluded.updated, settings = excluded.settings",
+            (input_path, digest, os.path.abspath(output_file), status, int(status == "failed"), error, time.time(), settings),
+        )
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
@@ -0,0 +1,172 @@
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+
+# Upper bounds (seconds) of the per-file latency histogram buckets.
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+# Latencies kept for the p50/p95 estimates; older ones only live on in the histogram.
+RECENT_LATENCIES = 10000
+
+METRICS_JSON = "pdbxml_metrics.json"
+METRICS_PROM = "pdbxml_metrics.prom"
+
+def _size(path):
+    try:
+        return os.path.getsize(path)
+    except (OSError, TypeError):
+        return 0
+
+def _percentile(ordered, fraction):
+    """Nearest-rank percentile of an already sorted list (None if empty)."""
+    if not ordered:
+        return None
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+def _write_atomic(path, text):
+    # Written next to the target and renamed, so a collector never reads a half-written file.
+    temp = f"{path}.tmp"
+    with open(temp, "w", encoding="utf-8", newline="\n") as f:
+        f.write(text)
+    os.replace(temp, path)
+
+class BatchMetrics:
+    """Throughput counters and latency histogram of a batch run or long-running converter.
+
+    Every converted file adds its tests, cells, input and output bytes and
+    its latency (reading started to report saved); failures are files
+    given up on, retries the extra attempts made before that. Safe to
+    update from several threads.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self._clock = time.perf_counter()
+        self.files = 0
+        self.failures = 0
+        self.retries = 0
+        self.skipped = 0
+        self.tests = 0
+        self.cells = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+        self.recent = deque(maxlen=RECENT_LATENCIES)
+
+    def record(self, seconds, tests=0, cells=0, bytes_in=0, bytes_out=0):
+        """Counts one converted file (or upload)."""
+        with self.lock:
+            self.files += 1
+            self.tests += tests
+            self.cells += cells
+            self.bytes_in += bytes_in
+            self.bytes_out += bytes_out
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    self.buckets[i] += 1
+                    break
+            self.latency_sum += seconds
+            self.latency_max = max(self.latency_max, seconds)
+            self.recent.append(seconds)
+
+    def record_file(self, input_file, output_file, seconds, tests=0, cells=0, bytes_out=None):
+        """record() taking the byte counts from the sizes of the input and report files.
+
+        bytes_out overrides the report size, for reports that are not files
+        of their own (archive members).
+        """
+        self.record(seconds, tests, cells, _size(input_file), _size(output_file) if bytes_out is None else bytes_out)
+
+    def record_failure(self, input_file=None):
+        with self.lock:
+            self.failures += 1
+
+    def record_retries(self, count=1):
+        with self.lock:
+            self.retries += count
+
+    def record_skipped(self, input_file=None):
+        """Counts a file left alone because its report is already up to date."""
+        with self.lock:
+            self.skipped += 1
+
+    def summary(self):
+        """The counters, rates and latency percentiles as a JSON-ready dict."""
+        with self.lock:
+            elapsed = time.perf_counter() - self._clock
+            ordered = sorted(self.recent)
+            rate = (lambda count: count / elapsed) if elapsed > 0 else (lambda count: 0.0)
+            return {
+                "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+                "elapsed_seconds": elapsed,
+                "files": self.files,
+                "failures": self.failures,
+                "retries": self.retries,
+                "skipped": self.skipped,
+                "tests": self.tests,
+                "cells": self.cells,
+                "bytes_in": self.bytes_in,
+                "bytes_out": self.bytes_out,
+                "files_per_second": rate(self.files),
+                "tests_per_second": rate(self.tests),
+                "cells_per_second": rate(self.cells),
+                "latency_seconds": {
+                    "p50": _percentile(ordered, 0.5),
+                    "p95": _percentile(ordered, 0.95),
+                    "max": self.latency_max if self.files else None,
+                    "mean": self.latency_sum / self.files if self.files else None,
+                },
+            }
+
+    def prometheus(self):
+        """The metrics in the Prometheus text exposition format."""
+        summary = self.summary()
+        with self.lock:
+            buckets = list(self.buckets)
+            latency_sum = self.latency_sum
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP pdbxml_{name} {help_text}")
+            lines.append(f"# TYPE pdbxml_{name} {kind}")
+            for labels, value in samples:
+                lines.append(f"pdbxml_{name}{labels} {value}")
+
+        metric("files_total", "counter", "Files by outcome.", [
+            ('{status="converted"}', summary["files"]),
+            ('{status="failed"}', summary["failures"]),
+            ('{status="skipped"}', summary["skipped"]),
+        ])
+        metric("retries_total", "counter", "Extra attempts made at files that failed.", [("", summary["retries"])])
+        metric("tests_total", "counter", "Tests written to reports.", [("", summary["tests"])])
+        metric("cells_total", "counter", "Cell rows written to reports.", [("", summary["cells"])])
+        metric("input_bytes_total", "counter", "Bytes of the converted input files.", [("", summary["bytes_in"])])
+        metric("output_bytes_total", "counter", "Bytes of the reports written.", [("", summary["bytes_out"])])
+        cumulative = 0
+        samples = []
+        for bound, count in zip(LATENCY_BUCKETS, buckets):
+            cumulative += count
+            samples.append((f'_bucket{{le="{bound}"}}', cumulative))
+        samples.append(('_bucket{le="+Inf"}', summary["files"]))
+        samples.append(("_sum", latency_sum))
+        samples.append(("_count", summary["files"]))
+        metric("file_latency_seconds", "histogram", "Time from starting to read a file to its report being saved.", samples)
+        latency = summary["latency_seconds"]
+        for key in ("p50", "p95", "max"):
+            if latency[key] is not None:
+                metric(f"file_latency_{key}_seconds", "gauge", f"{key} file latency over recent files.", [("", latency[key])])
+        metric("elapsed_seconds", "gauge", "Seconds since the metrics were started.", [("", summary["elapsed_seconds"])])
+        for name in ("files", "tests", "cells"):
+            metric(f"{name}_per_second", "gauge", f"Average {name} converted per second.", [("", summary[f"{name}_per_second"])])
+        return "\n".join(lines) + "\n"
+
+    def write_json(self, path):
+        _write_atomic(path, json.dumps(self.summary(), indent=1) + "\n")
+
+    def write_prometheus(self, path):
+        _write_atomic(path, self.prometheus())
@@ -0,0 +1,44 @@
+import sys
+
+# Distinct names remembered by each cache. PDBXML exports use a few hundred
+# tag and array names; the bound only matters for unusual input, whose extra
+# names are then normalised without being cached.
+NAME_CACHE_SIZE = 4096
+
+_shared = {}
+_lowered = {}
+_expat_names = {}
+
+def shared_name(name):
+    """Returns the one interned copy of a tag, array or attribute name.
+
+    Every cell record of every test then holds the same key objects instead
+    of its own copies of names such as "impedence_disp_3".
+    """
+    try:
+        return _shared[name]
+    except KeyError:
+        pass
+    if name is None:
+        return None
+    shared = sys.intern(name)
+    if len(_shared) < NAME_CACHE_SIZE:
+        _shared[shared] = shared
+    return shared
+
+def lower_name(name):
+    """shared_name(name.lower()), with the lower-casing cached per distinct name."""
+    try:
+        return _lowered[name]
+    except KeyError:
+        pass
+    lowered = shared_name(name.lower())
+    if len(_lowered) < NAME_CACHE_SIZE:
+        _lowered[shared_name(name)] = lowered
+    return lowered
+
+def parser_names():
+    """Intern dict to hand to expat parsers, shared by every file of a run."""
+    if len(_expat_names) > NAME_CACHE_SIZE:
+        _expat_names.clear()
+    return _expat_names
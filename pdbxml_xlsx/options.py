@@ -0,0 +1,25 @@
+from dataclasses import dataclass
+from typing import Optional
+
+from .filters import TestFilter
+
+
+@dataclass
+class Options:
+    """Conversion settings shared by every entry point.
+
+    graphs adds the voltage/impedance charts under each test; backend picks
+    the XML reader ("auto", "lxml", "etree" or "expat", see reader.BACKENDS);
+    encoding overrides the one detected from the BOM/XML declaration;
+    file_jobs > 1 splits the tests of each file over that many processes;
+    test_filter restricts which forms and tests are read; compression is
+    the ZIP level of the saved workbooks ("store", "fast", "default" or
+    "max", see excel.COMPRESSION_LEVELS).
+    """
+
+    graphs: bool = True
+    backend: str = "auto"
+    encoding: Optional[str] = None
+    file_jobs: int = 1
+    test_filter: Optional[TestFilter] = None
+    compression: str = "default"
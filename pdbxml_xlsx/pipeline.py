@@ -0,0 +1,293 @@
+import dataclasses
+import io
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .archive import ReportArchive
+from .excel import type_test, new_workbook, write_test, finish_workbook, save_workbook, write_excel, report_path
+from .journal import file_digest, options_key
+from .reader import iter_tests
+from .split import parse_xml_parallel
+
+# Maximum number of tests buffered between pipeline stages. Each test holds
+# every array of the string, so this is what caps memory on large batches.
+QUEUE_SIZE = 16
+# Number of times a failing file is tried before the batch gives up on it.
+MAX_ATTEMPTS = 3
+
+_DONE = object()
+
+def _put(q, item, stop):
+    """Puts item on a bounded queue, giving up if the pipeline has been stopped."""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+def _read_stage(input_files, options, out_q, stop, started):
+    """Streams (index, formname, test) items for every input file, in order.
+
+    A file that cannot be read is reported as an (index, formname, exception)
+    item and the stage moves on to the next file. The time each file is
+    started is stored in `started`, by index.
+    """
+    for index, input_file in enumerate(input_files):
+        started[index] = time.perf_counter()
+        formname = ""
+        try:
+            if options.file_jobs == 1:
+                tests = iter_tests(input_file, options.backend, options.encoding, options.test_filter)
+            else:
+                formname, all_tests = parse_xml_parallel(input_file, options.file_jobs, options.backend, options.encoding, options.test_filter)
+                tests = ((formname, test) for test in all_tests)
+            for formname, test in tests:
+                if not _put(out_q, (index, formname, test), stop):
+                    return
+            item = (index, formname, _DONE)
+        except Exception as e:
+            item = (index, formname, e)
+        if not _put(out_q, item, stop):
+            return
+    _put(out_q, _DONE, stop)
+
+def _transform_stage(in_q, out_q, stop):
+    """Types each test coming from the reader so the writer only has to place cells."""
+    while not stop.is_set():
+        try:
+            item = in_q.get(timeout=0.1)
+        except queue.Empty:
+            continue
+        if item is not _DONE and item[2] is not _DONE and not isinstance(item[2], Exception):
+            index, formname, test = item
+            try:
+                item = (index, formname, type_test(test))
+            except Exception as e:
+                item = (index, formname, e)
+        if not _put(out_q, item, stop) or item is _DONE:
+            return
+
+def _save(wb, output_file, options, archive):
+    """Saves wb as output_file, or streams it into the archive member of that name.
+
+    Returns the path or the member name.
+    """
+    if archive is None:
+        save_workbook(wb, output_file, options.compression)
+        return output_file
+    name = os.path.basename(output_file)
+    with archive.open(name) as member:
+        save_workbook(wb, member, options.compression)
+    return name
+
+def _record(metrics, archive, input_file, output_file, seconds, num_tests, num_cells):
+    bytes_out = None if archive is None else archive.size(output_file)
+    metrics.record_file(input_file, output_file, seconds, num_tests, num_cells, bytes_out)
+
+def run_pipeline(input_files, output_folder, options, queue_size=QUEUE_SIZE, metrics=None, archive=None, on_done=None, on_error=None):
+    """Converts input_files to reports in output_folder through a staged pipeline.
+
+    A reader thread streams tests into a bounded queue, a transform thread
+    types them and the calling thread appends them to the workbook of their
+    input file, saving each one as soon as its last test has been written.
+    Reading the next file therefore overlaps with writing and saving the
+    previous one. A failing file only discards its own workbook. Converted
+    files are counted in `metrics` (a BatchMetrics) if given. With a
+    ReportArchive, reports are streamed into it as members named like the
+    report files, and those names are returned instead of paths.
+    on_done(index, report path) and on_error(index, exception) are called
+    as soon as a file has been saved or has failed.
+
+    Returns ({index: report path}, {index: exception}).
+    """
+    stop = threading.Event()
+    started = {}
+    read_q = queue.Queue(maxsize=queue_size)
+    typed_q = queue.Queue(maxsize=queue_size)
+    stages = [
+        threading.Thread(target=_read_stage, args=(input_files, options, read_q, stop, started), daemon=True),
+        threading.Thread(target=_transform_stage, args=(read_q, typed_q, stop), daemon=True),
+    ]
+    for stage in stages:
+        stage.start()
+
+    output_files = {}
+    errors = {}
+
+    def fail(index, error):
+        errors[index] = error
+        if on_error is not None:
+            on_error(index, error)
+
+    workbook = None
+    num_tests = 0
+    num_cells = 0
+    try:
+        while True:
+            item = typed_q.get()
+            if item is _DONE:
+                break
+            index, formname, typed_test = item
+            if index in errors:
+                continue
+            if isinstance(typed_test, Exception):
+                fail(index, typed_test)
+                workbook = None
+                continue
+            if workbook is None:
+                workbook = new_workbook()
+                num_tests = 0
+                num_cells = 0
+            wb, ws = workbook
+            try:
+                if typed_test is _DONE:
+                    workbook = None
+                    finish_workbook(ws, formname, num_tests)
+                    output_file = _save(wb, report_path(input_files[index], output_folder), options, archive)
+                    output_files[index] = output_file
+                    if on_done is not None:
+                        on_done(index, output_file)
+                    if metrics is not None:
+                        _record(metrics, archive, input_files[index], output_file, time.perf_counter() - started[index], num_tests, num_cells)
+                else:
+                    write_test(ws, typed_test, options.graphs)
+                    num_tests += 1
+                    num_cells += len(typed_test[1])
+            except Exception as e:
+                fail(index, e)
+                workbook = None
+    finally:
+        stop.set()
+        for stage in stages:
+            stage.join()
+    return output_files, errors
+
+def convert_file(input_file, output_file, options):
+    """Converts a single file and returns the path of its report."""
+    return convert_file_counted(input_file, output_file, options)[0]
+
+def convert_file_counted(input_file, output_file, options):
+    """convert_file returning (report path, tests, cells, seconds); the unit of work of the process pools.
+
+    With output_file None the report is not saved: its bytes are returned
+    in place of the path.
+    """
+    start = time.perf_counter()
+    formname, all_tests = parse_xml_parallel(input_file, options.file_jobs, options.backend, options.encoding, options.test_filter)
+    target = io.BytesIO() if output_file is None else output_file
+    write_excel(formname, all_tests, options.graphs, target, options.compression)
+    result = target.getvalue() if output_file is None else output_file
+    return result, len(all_tests), sum(len(test[1]) for test in all_tests), time.perf_counter() - start
+
+def run_pool(input_files, output_folder, options, jobs, metrics=None, archive=None, on_done=None, on_error=None):
+    """Converts input_files in a pool of `jobs` processes, one file per task.
+
+    Files are not split further, whatever options.file_jobs says. With a
+    ReportArchive the workers send the reports back as bytes, which are
+    added to it in the order they finish. Results are handled as the workers finish them, calling
+    on_done and on_error like run_pipeline. Returns ({index: report path
+    or member name}, {index: exception}) like run_pipeline.
+    """
+    output_files = {}
+    errors = {}
+    # Every worker already converts a whole file; splitting files over more
+    # processes from inside them would start jobs * file_jobs processes.
+    options = dataclasses.replace(options, file_jobs=1)
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {
+            pool.submit(convert_file_counted, input_file, None if archive is not None else report_path(input_file, output_folder), options): index
+            for index, input_file in enumerate(input_files)
+        }
+        for future in as_completed(futures):
+            index = futures[future]
+            try:
+                output_file, num_tests, num_cells, seconds = future.result()
+                if archive is not None:
+                    name = os.path.basename(report_path(input_files[index], output_folder))
+                    archive.write(name, output_file)
+                    output_file = name
+            except Exception as e:
+                errors[index] = e
+                if on_error is not None:
+                    on_error(index, e)
+                continue
+            output_files[index] = output_file
+            if on_done is not None:
+                on_done(index, output_file)
+            if metrics is not None:
+                _record(metrics, archive, input_files[index], output_file, seconds, num_tests, num_cells)
+    return output_files, errors
+
+def convert_batch(input_files, output_folder, options, queue_size=QUEUE_SIZE, journal=None, max_attempts=MAX_ATTEMPTS, jobs=1, metrics=None, archive=None):
+    """Converts input_files to reports in output_folder, isolating failures per file.
+
+    With jobs=1 the files go through the threaded pipeline in this process,
+    otherwise they are spread over a pool of `jobs` processes. Files that
+    fail are retried up to max_attempts times in total. With a Journal,
+    every outcome is recorded as it happens and inputs that were already
+    converted with the same content are skipped, so an interrupted run can
+    simply be started again. With a BatchMetrics, throughput, latency,
+    retries and the files that failed in the end are counted in it. With a
+    ReportArchive, or the path of a .zip to create, the reports are written
+    into it instead of output_folder; it cannot be used with a journal.
+
+    Returns (list of report paths or archive members, {input file: error message}).
+    """
+    if journal is not None and archive is not None:
+        raise ValueError("A journal cannot be used with an archive: the reports of skipped files would be missing from it")
+    if isinstance(archive, (str, os.PathLike)):
+        # Opened only once the arguments are known to be valid, so a refused
+        # batch does not leave an empty archive behind.
+        with ReportArchive(archive) as report_archive:
+            return convert_batch(input_files, output_folder, options, queue_size, journal, max_attempts, jobs, metrics, report_archive)
+    digests = {}
+    settings = options_key(options)
+    output_files = []
+    todo = []
+    for input_file in input_files:
+        if journal is not None:
+            try:
+                digests[input_file] = file_digest(input_file)
+            except OSError:
+                digests[input_file] = None
+            if journal.is_done(input_file, digests[input_file], report_path(input_file, output_folder), settings):
+                output_files.append(report_path(input_file, output_folder))
+                if metrics is not None:
+                    metrics.record_skipped(input_file)
+                continue
+        todo.append(input_file)
+
+    failed = {}
+    for attempt in range(max_attempts):
+        if not todo:
+            break
+        if attempt and metrics is not None:
+            metrics.record_retries(len(todo))
+        on_done = on_error = None
+        if journal is not None:
+            # Every outcome is journalled as soon as it is known, so a batch
+            # that is killed halfway still skips the files it finished.
+            def on_done(index, output_file, todo=todo):
+                journal.record(todo[index], digests[todo[index]], output_file, "done", settings=settings)
+
+            def on_error(index, error, todo=todo):
+                journal.record(todo[index], digests[todo[index]], report_path(todo[index], output_folder), "failed", str(error), settings)
+        if jobs == 1:
+            converted, errors = run_pipeline(todo, output_folder, options, queue_size, metrics, archive, on_done, on_error)
+        else:
+            converted, errors = run_pool(todo, output_folder, options, jobs, metrics, archive, on_done, on_error)
+        for index in sorted(converted):
+            output_files.append(converted[index])
+            failed.pop(todo[index], None)
+        for index, error in errors.items():
+            failed[todo[index]] = str(error)
+        todo = [todo[index] for index in sorted(errors)]
+    if metrics is not None:
+        for input_file in failed:
+            metrics.record_failure(input_file)
+    return output_files, failed
@@ -0,0 +1,375 @@
+import xml.etree.ElementTree as ET
+from xml.parsers import expat
+
+from .filters import TestFilter
+from .names import lower_name, parser_names, shared_name
+from .source import FragmentReader, MappedSource
+
+DATA_TAGS = [
+    ("avgimpedence", "Average Impedance (mΩ)"),
+    ("voltagesum", "Total String Voltage (V)"),
+    ("deviationvoltage", "Deviation from Charger Voltage (%)"),
+    ("minvolts", "Min Voltage (V)"),
+    ("maxvolts", "Max Voltage (V)"),
+    ("avgtemp", "Average Temperature (°C)"),
+]
+STRINGNAME_TAGS = [
+    ("stringname", "String Name"),
+    ("pdbequipmenttype", "Battery Type"),
+]
+DEVIATION_TAGS = [
+    ("warningdeviationohm", "Warning Deviation (mΩ)"),
+    ("alloweddeviationohm", "Alarm Deviation (mΩ)"),
+    ("warningdeviation", "Warning Deviation (%)"),
+    ("alloweddeviation", "Alarm Deviation (%)"),
+]
+JARCELLS_TAGS = [
+    ("numjars", "Number of Jars"),
+    ("numcells", "Number of Cells"),
+    ("cellsperjar", "Number of Cells/Jar"),
+    ("numstraps", "Number of Straps"),
+]
+
+SECTIONS = ("data", "nameplate", "copyhistory")
+
+# Filter used when none is given: every test of the first form.
+ALL_TESTS = TestFilter()
+
+# Preference order when the backend is "auto", fastest first as measured on
+# PDBXML exports; the first one installed wins. expat only builds the fields
+# of the report, which beats ElementTree building every element.
+BACKEND_ORDER = ("lxml", "expat", "etree")
+
+try:
+    from lxml import etree as lxml_etree
+except ImportError:
+    lxml_etree = None
+
+def section_tags(element):
+    """Returns the text of the first <tag> child of element for each lower-cased name."""
+    tags = {}
+    for tag in element.findall("tag"):
+        tags.setdefault(lower_name(tag.get("name", "")), tag.text)
+    return tags
+
+def copy_tags(tags, mapping, target):
+    """Copies the mapped tag texts into target under their report labels."""
+    for name, label in mapping:
+        if name in tags:
+            target[label] = tags[name]
+
+def add_item(cells, array_name, index, text):
+    """Stores one <arrayitem> value in the record of its cell, creating it on first use."""
+    cell_no = int(index)
+    cell_entry = cells.get(cell_no)
+    if cell_entry is None:
+        cell_entry = cells[cell_no] = {"Cell No": cell_no}
+    cell_entry[array_name] = text if text is not None else ""
+
+def build_test(date, sections, cells, formname=""):
+    """Assembles the test tuple consumed by write_excel.
+
+    sections is a list of (section name, tags) pairs in document order, tags
+    being a section_tags() style dict. Returns the form name (or the one
+    passed in if the test has none) and the test tuple.
+    """
+    general_info = {}
+    stringname = {}
+    jarcells = {}
+    deviation = {}
+    tablesummary = {}
+    baseline = "N/A"
+
+    general_info["Test Date"] = date
+
+    for section, tags in sections:
+        if section == "data":
+            if "temperature" in tags:
+                general_info["Ambient Temp. (°C)"] = tags["temperature"]
+            if "formname" in tags:
+                formname = tags["formname"]
+            copy_tags(tags, DATA_TAGS, tablesummary)
+        elif section == "nameplate":
+            copy_tags(tags, STRINGNAME_TAGS, stringname)
+            copy_tags(tags, DEVIATION_TAGS, deviation)
+        elif section == "copyhistory":
+            copy_tags(tags, JARCELLS_TAGS, jarcells)
+            if "instrbaselinez" in tags:
+                baseline = tags["instrbaselinez"]
+
+    test_data = (general_info, list(cells.values()), stringname, jarcells, deviation, tablesummary, baseline)
+    return formname, test_data
+
+def string_name(sections):
+    """Returns the string name build_test would report for these sections."""
+    name = None
+    for section, tags in sections:
+        if section == "nameplate" and "stringname" in tags:
+            name = tags["stringname"]
+    return name
+
+def read_test(test, formname="", test_filter=ALL_TESTS):
+    """Extracts the report fields of a single <test> element (ElementTree or lxml).
+
+    Returns None, without reading any array, if test_filter rejects the
+    string the test belongs to.
+    """
+    sections = [(child.tag, section_tags(child)) for child in test if child.tag in SECTIONS]
+    if not test_filter.accepts_string(string_name(sections)):
+        return None
+
+    cells = {}
+    for array in test.iter("array"):
+        array_name = shared_name(array.get("name"))
+        for item in array.findall("arrayitem"):
+            add_item(cells, array_name, item.get("index"), item.text)
+
+    return build_test(test.get("date"), sections, cells, formname)
+
+def _iter_etree(source, encoding=None, test_filter=ALL_TESTS):
+    """ElementTree backend: iterparse, keeping one <test> subtree at a time."""
+    formname = ""
+    depth = 0
+    in_form = False
+    wanted = False
+    parser = ET.XMLParser(target=ET.TreeBuilder(), encoding=encoding) if encoding else None
+    for event, elem in ET.iterparse(source, events=("start", "end"), parser=parser):
+        if event == "start":
+            depth += 1
+            if depth == 2 and elem.tag == "form":
+                in_form = test_filter.accepts_form(elem.get("name"))
+            elif depth == 3 and elem.tag == "test":
+                wanted = in_form and test_filter.accepts_test(elem.get("date"), elem.get("resultsguid"))
+            continue
+        depth -= 1
+        if depth == 2 and elem.tag == "test":
+            result = read_test(elem, formname, test_filter) if wanted else None
+            elem.clear()
+            if result is not None:
+                formname, test = result
+                yield formname, test
+        elif depth == 1 and elem.tag == "form":
+            if in_form:
+                return
+            elem.clear()
+
+def _lxml_events(events):
+    """Passes lxml's events through, raising its syntax errors as ET.ParseError.
+
+    Matches the other backends, and lxml's own exceptions cannot be pickled
+    back from worker processes.
+    """
+    try:
+        yield from events
+    except lxml_etree.XMLSyntaxError as e:
+        raise ET.ParseError(str(e)) from None
+
+def _iter_lxml(source, encoding=None, test_filter=ALL_TESTS):
+    """lxml backend: iterparse filtered down to <test> and <form> events."""
+    formname = ""
+    in_form = False
+    wanted = False
+    events = lxml_etree.iterparse(source.byte_reader(), events=("start", "end"), tag=("test", "form"), encoding=encoding, resolve_entities=False)
+    for event, elem in _lxml_events(events):
+        parent = elem.getparent()
+        if parent is None or parent.getparent() is not None and parent.getparent().getparent() is not None:
+            continue
+        if elem.tag == "form":
+            if event == "start":
+                in_form = test_filter.accepts_form(elem.get("name"))
+            elif in_form:
+                return
+            else:
+                elem.clear()
+            continue
+        if parent.tag != "form":
+            continue
+        if event == "start":
+            wanted = in_form and test_filter.accepts_test(elem.get("date"), elem.get("resultsguid"))
+            continue
+        result = read_test(elem, formname, test_filter) if wanted else None
+        elem.clear()
+        while elem.getprevious() is not None:
+            del parent[0]
+        if result is not None:
+            formname, test = result
+            yield formname, test
+
+class _ExpatTestReader:
+    """Event handler that keeps only the fields read_test would look at.
+
+    No tree is built: section tags, array items and the test date are
+    collected straight from the parser callbacks, and everything else in the
+    file is skipped, including the whole content of tests and forms the
+    filter rejects from their attributes.
+    """
+
+    def __init__(self, test_filter=ALL_TESTS):
+        self.test_filter = test_filter
+        self.stack = []
+        self.tests = []
+        self.formname = ""
+        self.done = False
+        self.in_form = False
+        self.text = None
+        self.test = None
+
+    def start(self, name, attrs):
+        stack = self.stack
+        stack.append(name)
+        self.text = None
+        depth = len(stack)
+        if self.test is None:
+            if depth == 2 and name == "form":
+                self.in_form = self.test_filter.accepts_form(attrs.get("name"))
+            elif depth == 3 and name == "test" and stack[1] == "form" and self.in_form and not self.done:
+                if self.test_filter.accepts_test(attrs.get("date"), attrs.get("resultsguid")):
+                    self.test = (attrs.get("date"), [], {}, [])
+            return
+        date, sections, cells, arrays = self.test
+        if name == "array":
+            arrays.append((depth, shared_name(attrs.get("name"))))
+        elif name == "arrayitem":
+            if arrays and arrays[-1][0] == depth - 1:
+                self.item = (arrays[-1][1], attrs.get("index"))
+                self.text = []
+        elif depth == 4 and name in SECTIONS:
+            sections.append((name, {}))
+        elif depth == 5 and name == "tag" and stack[3] in SECTIONS:
+            self.tag_name = lower_name(attrs.get("name", ""))
+            self.text = []
+
+    def chars(self, data):
+        if self.text is not None:
+            self.text.append(data)
+
+    def end(self, name):
+        stack = self.stack
+        depth = len(stack)
+        stack.pop()
+        text = self.text
+        self.text = None
+        if self.test is None:
+            if depth == 2 and name == "form" and self.in_form:
+                self.done = True
+            return
+        date, sections, cells, arrays = self.test
+        if name == "arrayitem" and text is not None:
+            add_item(cells, self.item[0], self.item[1], "".join(text) or None)
+        elif name == "tag" and text is not None:
+            sections[-1][1].setdefault(self.tag_name, "".join(text) or None)
+        elif name == "array" and arrays and arrays[-1][0] == depth:
+            arrays.pop()
+        elif depth == 3 and name == "test":
+            self.test = None
+            if self.test_filter.accepts_string(string_name(sections)):
+                self.formname, test = build_test(date, sections, cells, self.formname)
+                self.tests.append((self.formname, test))
+
+def _iter_expat(source, encoding=None, test_filter=ALL_TESTS, chunk_size=64 * 1024):
+    """expat backend: builds the test tuples directly from parser events."""
+    handler = _ExpatTestReader(test_filter)
+    parser = expat.ParserCreate(encoding, intern=parser_names())
+    parser.buffer_text = True
+    parser.StartElementHandler = handler.start
+    parser.EndElementHandler = handler.end
+    parser.CharacterDataHandler = handler.chars
+
+    try:
+        while not handler.done:
+            chunk = source.read(chunk_size)
+            parser.Parse(chunk, not chunk)
+            yield from handler.tests
+            handler.tests.clear()
+            if not chunk:
+                break
+    except expat.ExpatError as e:
+        raise ET.ParseError(str(e)) from None
+
+BACKENDS = {
+    "etree": _iter_etree,
+    "expat": _iter_expat,
+    "lxml": _iter_lxml,
+}
+
+def available_backends():
+    """Names of the backends that can run in this environment, in preference order."""
+    return [name for name in BACKEND_ORDER if name != "lxml" or lxml_etree is not None]
+
+def resolve_backend(backend="auto"):
+    """Maps "auto" to the fastest installed backend and validates explicit names."""
+    if backend == "auto":
+        return available_backends()[0]
+    if backend not in available_backends():
+        raise ValueError(f"XML backend '{backend}' is not available (choose from {', '.join(available_backends())})")
+    return backend
+
+def prunable(test_filter):
+    """True if test_filter can reject tests from their start tag alone."""
+    return test_filter.forms is None and (
+        test_filter.since is not None or test_filter.until is not None or test_filter.guids is not None
+    )
+
+def prune_tests(source, test_filter):
+    """The byte ranges of the tests test_filter accepts, found before any parser sees them.
+
+    The <test> start tags are located by byte scan and only their attributes
+    are decoded. Returns None when nothing would be dropped.
+    """
+    ranges = source.first_form_test_ranges()
+    wanted = []
+    for start, end in ranges:
+        attributes = source.start_tag_attributes(start)
+        if test_filter.accepts_test(attributes.get("date"), attributes.get("resultsguid")):
+            wanted.append((start, end))
+    if len(wanted) == len(ranges):
+        return None
+    return wanted
+
+def iter_tests(file_path, backend="auto", encoding=None, test_filter=None):
+    """Streams the tests of the first <form> of an XML or PDBXML file.
+
+    Yields (formname, test) pairs, formname being the latest form name seen
+    so far. Each test is released once it has been read, so memory stays
+    bounded by the largest single test rather than the whole file. backend
+    is one of BACKENDS or "auto" for the fastest one installed. The file is
+    memory-mapped and its encoding taken from its BOM or XML declaration
+    unless `encoding` overrides it. With a TestFilter, the first form it
+    accepts is read and only the tests it accepts are yielded.
+    """
+    iter_backend = BACKENDS[resolve_backend(backend)]
+    test_filter = test_filter or ALL_TESTS
+    with MappedSource(file_path) as source:
+        wanted = prune_tests(source, test_filter) if prunable(test_filter) else None
+        if wanted is None:
+            yield from iter_backend(source, encoding, test_filter)
+            return
+        # Only the accepted tests are parsed, streamed from the mapped file.
+        yield from iter_fragment(source, wanted, backend, encoding, test_filter)
+
+def iter_fragment(source, ranges, backend="auto", encoding=None, test_filter=None):
+    """Streams the tests at the given <test> byte ranges of an open MappedSource, like iter_tests."""
+    iter_backend = BACKENDS[resolve_backend(backend)]
+    with FragmentReader(source, ranges, encoding) as fragment:
+        yield from iter_backend(fragment, encoding, test_filter or ALL_TESTS)
+
+def parse_xml(file_path, backend="auto", encoding=None, test_filter=None):
+    """Parses an XML or PDBXML file and extracts structured data for each battery cell."""
+    formname = ""
+    all_tests = []
+    for formname, test in iter_tests(file_path, backend, encoding, test_filter):
+        all_tests.append(test)
+    return formname, all_tests
+
+def cross_check_backends(file_path, backends=None):
+    """Parses file_path with every available backend and checks they agree.
+
+    Returns the parse_xml result; raises AssertionError naming the first
+    backend whose output differs from the first one's.
+    """
+    backends = backends or available_backends()
+    reference = parse_xml(file_path, backends[0])
+    for backend in backends[1:]:
+        if parse_xml(file_path, backend) != reference:
+            raise AssertionError(f"XML backend '{backend}' disagrees with '{backends[0]}' on {file_path}")
+    return reference
@@ -0,0 +1,264 @@
+import argparse
+import concurrent.futures
+import csv
+import io
+import json
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from .excel import write_excel, type_test
+from .filters import TestFilter
+from .metrics import BatchMetrics
+from .reader import parse_xml
+
+CONTENT_TYPES = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv; charset=utf-8",
+    "json": "application/json",
+}
+CSV_HEADERS = ["Test Date", "String Name", "Cell No.", "Impedance (mΩ)", "% Deviation (Baseline)", "% Variation (String)", "Voltage (V)", "Time", "Temperature (°C)"]
+
+def render_xlsx(formname, all_tests, graph_bool):
+    """Renders the Excel report into memory."""
+    output = io.BytesIO()
+    write_excel(formname, all_tests, graph_bool, output)
+    return output.getvalue()
+
+def render_csv(formname, all_tests, graph_bool):
+    """Renders the per-cell table of every test as a single CSV."""
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(CSV_HEADERS)
+    for test in all_tests:
+        general_info, cell_data, stringname = test[:3]
+        prefix = [general_info.get("Test Date"), stringname.get("String Name", "")]
+        for row in type_test(test)[1]:
+            writer.writerow(prefix + row)
+    return output.getvalue().encode("utf-8")
+
+def render_json(formname, all_tests, graph_bool):
+    """Renders the parsed tests as JSON, keeping the text found in the file."""
+    tests = []
+    for general_info, cell_data, stringname, jarcells, deviation, tablesummary, baseline in all_tests:
+        tests.append({
+            "general_info": general_info,
+            "string": stringname,
+            "jarcells": jarcells,
+            "deviation": deviation,
+            "tablesummary": tablesummary,
+            "baseline": baseline,
+            "cells": cell_data,
+        })
+    return json.dumps({"formname": formname, "tests": tests}, ensure_ascii=False).encode("utf-8")
+
+RENDERERS = {"xlsx": render_xlsx, "csv": render_csv, "json": render_json}
+
+def convert(data, fmt, graph_bool, test_filter=None):
+    """Converts an uploaded PDBXML document; runs in a worker process.
+
+    Returns the rendered bytes, the parse/render timings in milliseconds and
+    the number of tests and cells converted.
+    """
+    start = time.perf_counter()
+    formname, all_tests = parse_xml(io.BytesIO(data), test_filter=test_filter)
+    parsed = time.perf_counter()
+    body = RENDERERS[fmt](formname, all_tests, graph_bool)
+    timings = {"parse": (parsed - start) * 1000, "render": (time.perf_counter() - parsed) * 1000}
+    return body, timings, (len(all_tests), sum(len(test[1]) for test in all_tests))
+
+def _warm():
+    """Gives each worker process something to do so the pool is started up front."""
+    time.sleep(0.1)
+
+class ConversionHandler(BaseHTTPRequestHandler):
+    """POST /convert?format=xlsx|csv|json&graphs=0|1 with the PDBXML file as the body.
+
+    since, until, guid, form and string query parameters filter the tests
+    like the command line options of the same names.
+    """
+
+    server_version = "pdbxml-xlsx"
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == "/health":
+            self._send(200, "application/json", json.dumps(self.server.stats()).encode("utf-8"))
+        elif path == "/metrics":
+            self._send(200, "text/plain; version=0.0.4; charset=utf-8", self.server.metrics.prometheus().encode("utf-8"))
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/convert":
+            self.send_error(404)
+            return
+        query = parse_qs(url.query)
+        fmt = query.get("format", ["xlsx"])[0].lower()
+        graph_bool = query.get("graphs", ["1"])[0].lower() not in ("0", "false", "no")
+        if fmt not in RENDERERS:
+            self._send_text(400, f"Unknown format '{fmt}'")
+            return
+        try:
+            test_filter = None
+            if any(name in query for name in ("since", "until", "guid", "form", "string")):
+                test_filter = TestFilter.build(
+                    query.get("since", [None])[0], query.get("until", [None])[0],
+                    query.get("guid"), query.get("form"), query.get("string"),
+                )
+        except ValueError as e:
+            self._send_text(400, str(e))
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self._send_text(400, "Invalid Content-Length")
+            return
+        if not length:
+            self._send_text(400, "Request body must contain a PDBXML file")
+            return
+        if length > self.server.max_bytes:
+            self.send_error(413)
+            return
+
+        received = time.perf_counter()
+        # Turned away before the body is read, so a full queue does not
+        # hold an upload in memory for every request it refuses.
+        if not self.server.slots.acquire(blocking=False):
+            self.close_connection = True
+            self._send_text(503, "Conversion queue is full", {"Connection": "close"})
+            return
+        try:
+            data = self.rfile.read(length)
+            if not self.server.workers.acquire(timeout=self.server.queue_timeout):
+                self._send_text(503, "No worker became free in time")
+                return
+            queued = time.perf_counter()
+            try:
+                future = self.server.submit(convert, data, fmt, graph_bool, test_filter)
+            except Exception:
+                self.server.workers.release()
+                raise
+            # A conversion given up on keeps its worker busy until it ends,
+            # so the worker only counts as free again once it is done.
+            future.add_done_callback(lambda future: self.server.workers.release())
+            try:
+                body, timings, (num_tests, num_cells) = future.result(timeout=self.server.timeout)
+            except concurrent.futures.TimeoutError:
+                future.cancel()
+                self.server.metrics.record_failure()
+                self._send_text(504, f"Conversion took longer than {self.server.timeout:g} seconds")
+                return
+            except BrokenProcessPool:
+                self.server.metrics.record_failure()
+                self._send_text(500, "The worker process stopped during the conversion")
+                return
+            except Exception as e:
+                self.server.metrics.record_failure()
+                self._send_text(422, f"An error occurred: {e}")
+                return
+        finally:
+            self.server.slots.release()
+
+        total = (time.perf_counter() - received) * 1000
+        self.server.metrics.record(total / 1000, num_tests, num_cells, len(data), len(body))
+        timings = {"queue": (queued - received) * 1000, **timings, "total": total}
+        self._send(200, CONTENT_TYPES[fmt], body, {
+            "Server-Timing": ", ".join(f"{name};dur={value:.1f}" for name, value in timings.items()),
+        })
+
+    def _send_text(self, status, message, headers=None):
+        """Error response with the standard reason phrase and the message as a UTF-8 body.
+
+        The status line only takes latin-1, and messages can quote anything
+        found in an upload.
+        """
+        self._send(status, "text/plain; charset=utf-8", message.encode("utf-8"), headers)
+
+    def _send(self, status, content_type, body, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+class ConversionServer(ThreadingHTTPServer):
+    """HTTP server handing conversions to a pool of warm worker processes.
+
+    At most `jobs` conversions run at once; up to `backlog` more requests wait
+    for a free worker, for at most queue_timeout seconds, and any beyond
+    that are turned away with 503. A conversion still running after
+    `timeout` seconds is answered with 504, but its worker stays taken
+    until it finishes. If a worker process dies, the pool is replaced
+    rather than failing every later request. GET /metrics serves the
+    throughput and latency counters in Prometheus text format.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, jobs=2, backlog=16, timeout=120.0, queue_timeout=30.0, max_bytes=200 * 1024 * 1024):
+        super().__init__(address, ConversionHandler)
+        self.jobs = jobs
+        self.pool = ProcessPoolExecutor(max_workers=jobs)
+        self.pool_lock = threading.Lock()
+        for _ in range(jobs):
+            self.pool.submit(_warm)
+        self.slots = threading.BoundedSemaphore(jobs + backlog)
+        self.workers = threading.BoundedSemaphore(jobs)
+        self.timeout = timeout
+        self.queue_timeout = queue_timeout
+        self.max_bytes = max_bytes
+        self.metrics = BatchMetrics()
+
+    def submit(self, fn, *args):
+        """Submits fn to the worker pool, starting a new pool if the current one is broken."""
+        pool = self.pool
+        try:
+            return pool.submit(fn, *args)
+        except BrokenProcessPool:
+            return self._replace_pool(pool).submit(fn, *args)
+
+    def _replace_pool(self, broken):
+        """Replaces the broken pool, unless another request already has; returns the current pool."""
+        with self.pool_lock:
+            if self.pool is broken:
+                self.pool = ProcessPoolExecutor(max_workers=self.jobs)
+                broken.shutdown(wait=False)
+            return self.pool
+
+    def stats(self):
+        summary = self.metrics.summary()
+        return {"converted": summary["files"], "failed": summary["failures"]}
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown()
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve PDBXML to Excel/CSV/JSON conversions over HTTP")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on (default: 8765)")
+    parser.add_argument("-j", "--jobs", type=int, default=2, help="Number of worker processes (default: 2)")
+    parser.add_argument("--backlog", type=int, default=16, help="Requests allowed to wait for a worker (default: 16)")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Seconds before a conversion is abandoned (default: 120)")
+
+    args = parser.parse_args()
+    server = ConversionServer((args.host, args.port), args.jobs, args.backlog, args.timeout)
+    print(f"Listening on http://{args.host}:{args.port}/convert")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+import codecs
+import io
+import mmap
+import os
+import re
+from xml.sax.saxutils import unescape
+
+BOMS = [
+    (codecs.BOM_UTF8, "utf-8"),
+    (codecs.BOM_UTF16_LE, "utf-16-le"),
+    (codecs.BOM_UTF16_BE, "utf-16-be"),
+]
+DECLARATION = re.compile(rb"""<\?xml[^>]*?encoding\s*=\s*["']([A-Za-z0-9._-]+)["']""")
+ATTRIBUTE = re.compile(r"""([\w.:-]+)\s*=\s*(?:"([^"]*)"|'([^']*)')""")
+TAG_NAME = re.compile(r"<(/?)([^\s/>]*)")
+QUOTED = re.compile(r""""[^"]*"|'[^']*'""")
+# Markup skipped whole by the byte scan, with what ends it: comments, CDATA
+# sections, processing instructions and declarations.
+SKIPPED = [("<!--", "-->"), ("<![CDATA[", "]]>"), ("<?", "?>"), ("<!", ">")]
+
+def sniff_encoding(head):
+    """Returns (encoding, BOM length) of an XML document from its first bytes.
+
+    A byte order mark wins, then a UTF-16 "<?" without one, then the
+    encoding of the XML declaration. Without any of these the document is
+    UTF-8, as the XML specification says.
+    """
+    for bom, encoding in BOMS:
+        if head.startswith(bom):
+            if encoding == "utf-8":
+                match = DECLARATION.match(head, len(bom))
+                if match:
+                    return match.group(1).decode("ascii").lower(), len(bom)
+            return encoding, len(bom)
+    if head.startswith(b"<\x00?\x00"):
+        return "utf-16-le", 0
+    if head.startswith(b"\x00<\x00?"):
+        return "utf-16-be", 0
+    match = DECLARATION.match(head)
+    if match:
+        return match.group(1).decode("ascii").lower(), 0
+    return "utf-8", 0
+
+def _open_quote(text):
+    """True if text ends inside a quoted attribute value."""
+    rest = QUOTED.sub("", text)
+    return '"' in rest or "'" in rest
+
+class MappedSource:
+    """Read-only view of an input file for the XML backends.
+
+    Paths are memory-mapped, so read() hands the parser slices of the page
+    cache without copying them into Python buffers first. Already open
+    file objects (such as uploads held in a BytesIO) are read into memory
+    once. The encoding is sniffed from the first bytes on opening.
+    """
+
+    def __init__(self, file_path):
+        self.name = file_path if isinstance(file_path, (str, os.PathLike)) else getattr(file_path, "name", "<stream>")
+        self._file = None
+        self._map = None
+        if isinstance(file_path, (str, bytes, os.PathLike)):
+            self._file = open(file_path, "rb")
+            try:
+                self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+                self.data = self._map
+            except ValueError:
+                self.data = b""
+        else:
+            self.data = file_path.read()
+        self._view = memoryview(self.data)
+        self._slice = None
+        self._hiding = None
+        self.pos = 0
+        self.encoding, self.bom_length = sniff_encoding(bytes(self._view[:1024]))
+
+    def __len__(self):
+        return len(self.data)
+
+    def read(self, size=-1):
+        """Returns the next slice of the file as a memoryview (empty at the end).
+
+        The previous slice is released first: parsers consume each chunk
+        before asking for the next one.
+        """
+        if self._slice is not None:
+            self._slice.release()
+        end = len(self.data) if size is None or size < 0 else min(self.pos + size, len(self.data))
+        self._slice = self._view[self.pos:end]
+        self.pos = end
+        return self._slice
+
+    def byte_reader(self):
+        """File object over the same data whose read() returns bytes, for lxml."""
+        if self._map is not None:
+            self._map.seek(0)
+            return self._map
+        return io.BytesIO(self.data)
+
+    def encode(self, text):
+        """Encodes markup in the document's encoding, for byte-level searches."""
+        try:
+            return text.encode(self.encoding)
+        except (LookupError, UnicodeEncodeError):
+            return text.encode("ascii")
+
+    def _markup(self, start):
+        """Reads the markup at the "<" at byte offset start.
+
+        Returns (kind, name, end): kind is "start", "empty" (a self-closing
+        tag), "end" or "skip" (comments, CDATA, processing instructions and
+        declarations), end the offset just past it, or -1 if it never ends.
+        """
+        data = self.data
+        for opener, closer in SKIPPED:
+            opener, closer = self.encode(opener), self.encode(closer)
+            if data[start:start + len(opener)] == opener:
+                end = data.find(closer, start + len(opener))
+                return "skip", None, end + len(closer) if end >= 0 else -1
+        width = len(self.encode(" "))
+        closing, name = TAG_NAME.match(bytes(self._view[start:start + 256 * width]).decode(self.encoding, "replace")).groups()
+        gt = self.encode(">")
+        end = data.find(gt, start)
+        # ">" may appear in attribute values, "<" may not: the tag ends at
+        # the first ">" outside quotes.
+        while end >= 0 and _open_quote(bytes(self._view[start:end]).decode(self.encoding, "replace")):
+            end = data.find(gt, end + len(gt))
+        if end < 0:
+            return "start", name, -1
+        if closing:
+            return "end", name, end + len(gt)
+        return ("empty" if data[end - width:end] == self.encode("/") else "start"), name, end + len(gt)
+
+    def _element_end(self, start, after):
+        """The offset just past the end tag of the element whose start tag spans start..after."""
+        data = self.data
+        close_tag = self.encode("</test>")
+        end = data.find(close_tag, after)
+        if end < 0:
+            return -1
+        # The first </test> closes this test unless something in between
+        # could hide or open one: a comment, CDATA, a processing
+        # instruction or a nested <test>.
+        if self._hiding is None:
+            markers = [re.escape(self.encode(marker)) for marker in ("<!", "<?")]
+            markers += [re.escape(self.encode("<test" + c)) for c in " \t\r\n/>"]
+            self._hiding = re.compile(b"|".join(markers))
+        if self._hiding.search(data, after, end) is None:
+            return end + len(close_tag)
+        depth = 1
+        pos = after
+        while depth:
+            start = data.find(self.encode("<"), pos)
+            if start < 0:
+                return -1
+            kind, name, pos = self._markup(start)
+            if pos < 0:
+                return -1
+            if kind == "start":
+                depth += 1
+            elif kind == "end":
+                depth -= 1
+        return pos
+
+    def first_form_test_ranges(self):
+        """Returns the (start, end) byte offsets of the <test> elements of the first <form>.
+
+        Found by scanning the raw bytes, without parsing, so the ranges can
+        be handed out to workers. Like the reader, only <test> elements
+        directly under the first <form> of the root count; comments, CDATA
+        sections and processing instructions are skipped. The content of a
+        test is only walked tag by tag if it holds one of those or a nested
+        <test>; otherwise its first </test> ends it.
+        """
+        data = self.data
+        lt = self.encode("<")
+        ranges = []
+        depth = 0
+        in_form = False
+        pos = 0
+        while True:
+            start = data.find(lt, pos)
+            if start < 0:
+                break
+            kind, name, pos = self._markup(start)
+            if pos < 0:
+                break
+            if kind == "end":
+                if in_form and depth == 2:
+                    break
+                depth -= 1
+                continue
+            if kind == "skip":
+                continue
+            if depth == 1 and name == "form":
+                if kind == "empty":
+                    break
+                in_form = True
+            elif in_form and depth == 2 and name == "test":
+                end = pos if kind == "empty" else self._element_end(start, pos)
+                if end < 0:
+                    break
+                ranges.append((start, end))
+                pos = end
+                continue
+            if kind == "start":
+                depth += 1
+        return ranges
+
+    def start_tag_attributes(self, start):
+        """Returns the attributes of the start tag beginning at byte offset start."""
+        end = self.data.find(self.encode(">"), start)
+        tag = bytes(self._view[start:end]).decode(self.encoding, "replace")
+        return {name: unescape(double if double or not single else single, {"&quot;": '"', "&apos;": "'"})
+                for name, double, single in ATTRIBUTE.findall(tag)}
+
+    def fragment_parts(self, ranges, encoding=None):
+        """The pieces of a standalone document holding only the given <test> ranges of this file.
+
+        The ranges are memoryviews of the file, not copies.
+        """
+        encoding = encoding or self.encoding
+        if encoding.startswith("utf-16"):
+            head = self.encode("\ufeff") + self.encode('<?xml version="1.0" encoding="UTF-16"?>')
+        else:
+            head = self.encode(f'<?xml version="1.0" encoding="{encoding}"?>')
+        parts = [head + self.encode("<powerdb.testdata><form>")]
+        parts.extend(self._view[start:end] for start, end in ranges)
+        parts.append(self.encode("</form></powerdb.testdata>"))
+        return parts
+
+    def fragment(self, ranges, encoding=None):
+        """Builds a standalone document holding only the given <test> ranges of this file."""
+        parts = self.fragment_parts(ranges, encoding)
+        try:
+            return b"".join(parts)
+        finally:
+            for part in parts[1:-1]:
+                part.release()
+
+    def close(self):
+        if self._slice is not None:
+            self._slice.release()
+            self._slice = None
+        self._view.release()
+        if self._map is not None:
+            self._map.close()
+        if self._file is not None:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class FragmentReader:
+    """File object streaming the document MappedSource.fragment() would build.
+
+    The pieces are handed out in turn, straight from the mapped file, so a
+    parser reading the kept tests of a large export never needs them all
+    copied into one buffer. Must be closed before its source.
+    """
+
+    def __init__(self, source, ranges, encoding=None):
+        self.name = source.name
+        self._parts = source.fragment_parts(ranges, encoding)
+        self._index = 0
+        self._offset = 0
+
+    def read(self, size=-1):
+        """Returns up to size bytes of the document (all that is left if size is negative)."""
+        chunks = []
+        while self._index < len(self._parts) and size != 0:
+            part = self._parts[self._index]
+            end = len(part) if size is None or size < 0 else min(len(part), self._offset + size)
+            chunks.append(part[self._offset:end])
+            if size is not None and size > 0:
+                size -= end - self._offset
+            if end == len(part):
+                self._index += 1
+                self._offset = 0
+            else:
+                self._offset = end
+        return b"".join(chunks)
+
+    def byte_reader(self):
+        return self
+
+    def close(self):
+        for part in self._parts[1:-1]:
+            part.release()
+        self._parts = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,59 @@
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from .reader import iter_tests, parse_xml, prunable
+from .source import MappedSource
+
+# Ranges handed to each worker task; several per worker evens out tests of
+# different sizes.
+TASKS_PER_JOB = 4
+
+def parse_ranges(file_path, ranges, backend="auto", encoding=None, test_filter=None):
+    """Parses the <test> elements at the given byte ranges of file_path.
+
+    Runs in a worker process. Returns the form name found in these tests
+    ("" if none of them has one) and their test tuples.
+    """
+    with MappedSource(file_path) as source:
+        fragment = source.fragment(ranges, encoding)
+    formname = ""
+    tests = []
+    for formname, test in iter_tests(io.BytesIO(fragment), backend, encoding, test_filter):
+        tests.append(test)
+    return formname, tests
+
+def parse_xml_parallel(file_path, jobs=None, backend="auto", encoding=None, test_filter=None, min_tests=8):
+    """parse_xml for one large file, spreading its tests over `jobs` processes.
+
+    The <test> elements are located by a byte scan and parsed as
+    independent fragments; results are put back in document order, so the
+    output is the same as parse_xml's. Files with fewer than min_tests tests,
+    inputs that are not paths and filters selecting forms by name (which
+    the byte scan cannot see) are parsed in this process.
+    """
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1 or not isinstance(file_path, (str, os.PathLike)) or test_filter is not None and test_filter.forms is not None:
+        return parse_xml(file_path, backend, encoding, test_filter)
+    with MappedSource(file_path) as source:
+        ranges = source.first_form_test_ranges()
+        if test_filter is not None and prunable(test_filter):
+            ranges = [
+                (start, end) for start, end in ranges
+                if test_filter.accepts_test(*map(source.start_tag_attributes(start).get, ("date", "resultsguid")))
+            ]
+    if len(ranges) < max(min_tests, 2):
+        return parse_xml(file_path, backend, encoding, test_filter)
+
+    size = -(-len(ranges) // (jobs * TASKS_PER_JOB))
+    batches = [ranges[i:i + size] for i in range(0, len(ranges), size)]
+    formname = ""
+    all_tests = []
+    with ProcessPoolExecutor(max_workers=min(jobs, len(batches))) as pool:
+        futures = [pool.submit(parse_ranges, file_path, batch, backend, encoding, test_filter) for batch in batches]
+        for future in futures:
+            batch_formname, tests = future.result()
+            if batch_formname != "":
+                formname = batch_formname
+            all_tests.extend(tests)
+    return formname, all_tests
@@ -0,0 +1,184 @@
+import os
+import sqlite3
+import time
+
+from .excel import convert_to_number, write_excel, report_path
+from .filters import TEST_DATE_FORMATS, _parse_date
+from .names import lower_name
+from .options import Options
+from .reader import iter_tests
+
+# Tests inserted per executemany batch.
+BATCH_TESTS = 200
+
+# Parts of the test tuple stored in the fields table, in tuple order.
+FIELD_GROUPS = ("general", "string", "jarcells", "deviation", "summary")
+
+# <array> names read by the report and the cells columns they are kept in.
+CELL_COLUMNS = [
+    ("impedence", "impedance"),
+    ("v", "baseline_deviation"),
+    ("d", "string_variation"),
+    ("voltage", "voltage"),
+    ("time", "time"),
+    ("tem_1", "temperature"),
+]
+
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS tests ("
+    " id INTEGER PRIMARY KEY,"
+    " source TEXT NOT NULL,"
+    " position INTEGER NOT NULL,"
+    " formname TEXT,"
+    " test_date TEXT,"
+    " tested_at TEXT,"
+    " string_name TEXT,"
+    " battery_type TEXT,"
+    " baseline,"
+    " loaded REAL)",
+    # Label/value pairs of the data, nameplate and copyhistory sections;
+    # value is the text from the export, number its numeric value if any.
+    "CREATE TABLE IF NOT EXISTS fields ("
+    " test_id INTEGER NOT NULL REFERENCES tests(id),"
+    " grp TEXT NOT NULL,"
+    " position INTEGER NOT NULL,"
+    " label TEXT NOT NULL,"
+    " value TEXT,"
+    " number REAL,"
+    " PRIMARY KEY (test_id, grp, position)) WITHOUT ROWID",
+    # Columns are left untyped so each value keeps the int/float/text type
+    # the report writes; rowid keeps the cells in document order.
+    "CREATE TABLE IF NOT EXISTS cells ("
+    " test_id INTEGER NOT NULL REFERENCES tests(id),"
+    " cell_no INTEGER NOT NULL,"
+    + "".join(f" {column}," for _, column in CELL_COLUMNS) +
+    " UNIQUE (test_id, cell_no))",
+    "CREATE INDEX IF NOT EXISTS tests_source ON tests (source, position)",
+    "CREATE INDEX IF NOT EXISTS tests_string_name ON tests (string_name)",
+    "CREATE INDEX IF NOT EXISTS tests_tested_at ON tests (tested_at)",
+    "CREATE INDEX IF NOT EXISTS fields_label ON fields (label, number)",
+    "CREATE INDEX IF NOT EXISTS cells_cell_no ON cells (cell_no)",
+]
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def _iso_date(date):
+    when = _parse_date(date or "", TEST_DATE_FORMATS)
+    return when.isoformat(sep=" ") if when is not None else None
+
+class Warehouse:
+    """SQLite store of every parsed test, queryable without the XML exports.
+
+    A test is a row of tests, the labelled report fields of its sections
+    are rows of fields and each cell is a row of cells. Reloading a file
+    replaces the tests it held before, so ingesting is repeatable. The
+    stored values are the ones the report is written from, so export()
+    gives the same workbook convert would.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        for statement in SCHEMA:
+            self.db.execute(statement)
+        self.db.commit()
+
+    def ingest(self, input_file, options=None):
+        """Loads the tests of input_file in one transaction and returns how many there were."""
+        options = options or Options()
+        source = os.path.abspath(input_file) if isinstance(input_file, (str, os.PathLike)) else getattr(input_file, "name", "<stream>")
+        count = 0
+        with self.db:
+            self.db.execute("DELETE FROM fields WHERE test_id IN (SELECT id FROM tests WHERE source = ?)", (source,))
+            self.db.execute("DELETE FROM cells WHERE test_id IN (SELECT id FROM tests WHERE source = ?)", (source,))
+            self.db.execute("DELETE FROM tests WHERE source = ?", (source,))
+            next_id = self.db.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM tests").fetchone()[0]
+            tests, fields, cells = [], [], []
+            loaded = time.time()
+            for formname, test in iter_tests(input_file, options.backend, options.encoding, options.test_filter):
+                test_id = next_id + count
+                general_info, cell_data, stringname, jarcells, deviation, tablesummary, baseline = test
+                tests.append((
+                    test_id, source, count, formname, general_info.get("Test Date"), _iso_date(general_info.get("Test Date")),
+                    stringname.get("String Name"), stringname.get("Battery Type"), baseline, loaded,
+                ))
+                for grp, group in zip(FIELD_GROUPS, (general_info, stringname, jarcells, deviation, tablesummary)):
+                    fields.extend((test_id, grp, i, label, value, _number(value)) for i, (label, value) in enumerate(group.items()))
+                for cell in cell_data:
+                    row = {lower_name(k): v for k, v in cell.items()}
+                    values = [None if name not in row else row[name] if name == "time" else convert_to_number(row[name]) for name, _ in CELL_COLUMNS]
+                    cells.append((test_id, row["cell no"], *values))
+                count += 1
+                if count % BATCH_TESTS == 0:
+                    self._flush(tests, fields, cells)
+            self._flush(tests, fields, cells)
+        return count
+
+    def _flush(self, tests, fields, cells):
+        self.db.executemany(f"INSERT INTO tests VALUES ({', '.join('?' * 10)})", tests)
+        self.db.executemany("INSERT INTO fields VALUES (?, ?, ?, ?, ?, ?)", fields)
+        self.db.executemany(f"INSERT INTO cells VALUES ({', '.join('?' * (2 + len(CELL_COLUMNS)))})", cells)
+        tests.clear()
+        fields.clear()
+        cells.clear()
+
+    def select(self, source=None, string_names=None, since=None, until=None):
+        """Returns (id, source) of the matching tests, by source file and document order."""
+        where, params = [], []
+        if source is not None:
+            where.append("source = ?")
+            params.append(os.path.abspath(source))
+        if string_names:
+            where.append(f"string_name COLLATE NOCASE IN ({', '.join('?' * len(string_names))})")
+            params.extend(string_names)
+        if since is not None:
+            where.append("tested_at >= ?")
+            params.append(since.isoformat(sep=" "))
+        if until is not None:
+            where.append("tested_at <= ?")
+            params.append(until.isoformat(sep=" "))
+        sql = "SELECT id, source FROM tests" + (" WHERE " + " AND ".join(where) if where else "") + " ORDER BY source, position"
+        return self.db.execute(sql, params).fetchall()
+
+    def load_test(self, test_id):
+        """Rebuilds the (formname, test tuple) of a stored test, as iter_tests yields it."""
+        formname, baseline = self.db.execute("SELECT formname, baseline FROM tests WHERE id = ?", (test_id,)).fetchone()
+        groups = {grp: {} for grp in FIELD_GROUPS}
+        for grp, label, value in self.db.execute("SELECT grp, label, value FROM fields WHERE test_id = ? ORDER BY grp, position", (test_id,)):
+            groups[grp][label] = value
+        columns = ", ".join(column for _, column in CELL_COLUMNS)
+        cell_data = []
+        for cell_no, *values in self.db.execute(f"SELECT cell_no, {columns} FROM cells WHERE test_id = ? ORDER BY rowid", (test_id,)):
+            cell = {"Cell No": cell_no}
+            cell.update((name, value) for (name, _), value in zip(CELL_COLUMNS, values) if value is not None)
+            cell_data.append(cell)
+        general_info, stringname, jarcells, deviation, tablesummary = (groups[grp] for grp in FIELD_GROUPS)
+        return formname, (general_info, cell_data, stringname, jarcells, deviation, tablesummary, baseline)
+
+    def export(self, output_folder, options=None, string_names=None, since=None, until=None, source=None):
+        """Writes a report per source file from the stored tests matching the criteria.
+
+        Returns the list of reports written.
+        """
+        options = options or Options()
+        by_source = {}
+        for test_id, path in self.select(source, string_names, since, until):
+            by_source.setdefault(path, []).append(test_id)
+        output_files = []
+        for path, test_ids in by_source.items():
+            formname = ""
+            all_tests = []
+            for test_id in test_ids:
+                formname, test = self.load_test(test_id)
+                all_tests.append(test)
+            output_file = report_path(path, output_folder)
+            write_excel(formname, all_tests, options.graphs, output_file, options.compression)
+            output_files.append(output_file)
+        return output_files
+
+    def close(self):
+        self.db.close()
@@ -0,0 +1,161 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from .excel import COMPRESSION_LEVELS, report_path
+from .options import Options
+from .metrics import BatchMetrics
+from .pipeline import MAX_ATTEMPTS, convert_file_counted
+
+EXTENSIONS = (".pdbxml", ".xml")
+
+def scan(watch_dirs):
+    """Returns {path: (size, mtime)} for every PDBXML/XML file under watch_dirs."""
+    found = {}
+    for watch_dir in watch_dirs:
+        for dirpath, dirnames, filenames in os.walk(watch_dir):
+            for filename in filenames:
+                if not filename.lower().endswith(EXTENSIONS):
+                    continue
+                path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                found[path] = (stat.st_size, stat.st_mtime)
+    return found
+
+def output_for(input_file, watch_dirs, output_dir):
+    """Mirrors the location of input_file under its watched folder into output_dir."""
+    for watch_dir in watch_dirs:
+        relative = os.path.relpath(os.path.dirname(input_file), watch_dir)
+        if not relative.startswith(os.pardir):
+            break
+    if len(watch_dirs) > 1:
+        relative = os.path.join(os.path.basename(os.path.normpath(watch_dir)), relative)
+    output_folder = os.path.normpath(os.path.join(output_dir, relative))
+    os.makedirs(output_folder, exist_ok=True)
+    return report_path(input_file, output_folder)
+
+def up_to_date(output_file, signature):
+    """True if output_file exists and is not older than the input whose (size, mtime) is signature."""
+    try:
+        return os.stat(output_file).st_mtime >= signature[1]
+    except OSError:
+        return False
+
+def watch(watch_dirs, output_dir, graph_bool=True, interval=1.0, settle=2.0, jobs=None, once=False, metrics_json=None, metrics_prom=None, compression="default"):
+    """Polls watch_dirs and converts new or changed files once they stop growing.
+
+    A file is only queued after its size and modification time have stayed
+    the same for `settle` seconds, so exports still being copied onto a share
+    are not read half written. Files already present at start-up are
+    converted too, unless their report is newer than they are, so a
+    restart does not convert the whole share again. If a worker process
+    dies, the pool is replaced and the files it was converting are tried
+    again, up to MAX_ATTEMPTS times. With `once`, returns after everything
+    found has been converted. Throughput and latency metrics are rewritten
+    to metrics_json and/or metrics_prom whenever a conversion finishes.
+    compression is the ZIP level of the reports (see
+    excel.COMPRESSION_LEVELS).
+    """
+    metrics = BatchMetrics()
+    converted = {}
+    pending = {}
+    running = {}
+    attempts = {}
+    pool = ProcessPoolExecutor(max_workers=jobs)
+    try:
+        while True:
+            now = time.monotonic()
+            found = scan(watch_dirs)
+            # Files deleted or renamed away (e.g. temporary copy names) are forgotten.
+            for seen in (pending, converted, attempts):
+                for path in [path for path in seen if path not in found]:
+                    del seen[path]
+            for path, signature in found.items():
+                if converted.get(path) == signature or path in running:
+                    continue
+                if path not in pending and up_to_date(output_for(path, watch_dirs, output_dir), signature):
+                    converted[path] = signature
+                    continue
+                if pending.get(path, (None,))[0] != signature:
+                    pending[path] = (signature, now)
+                    continue
+                if now - pending[path][1] < settle:
+                    continue
+                del pending[path]
+                output_file = output_for(path, watch_dirs, output_dir)
+                try:
+                    future = pool.submit(convert_file_counted, path, output_file, Options(graphs=graph_bool, compression=compression))
+                except BrokenProcessPool:
+                    # A worker died: start a new pool and submit the file again on the next scan.
+                    pool.shutdown(wait=False)
+                    pool = ProcessPoolExecutor(max_workers=jobs)
+                    pending[path] = (signature, now - settle)
+                    continue
+                print(f"Processing: {path}")
+                running[path] = (signature, future)
+
+            finished = False
+            for path, (signature, future) in list(running.items()):
+                if not future.done():
+                    continue
+                del running[path]
+                try:
+                    output_file, num_tests, num_cells, seconds = future.result()
+                except Exception as e:
+                    # Every file in the pool fails when one worker dies, not
+                    # only the one that killed it, so those are tried again.
+                    attempts[path] = attempts.get(path, 1) + 1
+                    if isinstance(e, BrokenProcessPool) and attempts[path] <= MAX_ATTEMPTS:
+                        pending[path] = (signature, now - settle)
+                        continue
+                    metrics.record_failure(path)
+                    print(f"Error converting {path}: {e}")
+                else:
+                    metrics.record_file(path, output_file, seconds, num_tests, num_cells)
+                    print(f"Saved: {output_file}")
+                converted[path] = signature
+                attempts.pop(path, None)
+                finished = True
+            if finished and metrics_json:
+                metrics.write_json(metrics_json)
+            if finished and metrics_prom:
+                metrics.write_prometheus(metrics_prom)
+
+            if once and not pending and not running:
+                return
+            time.sleep(interval)
+    finally:
+        pool.shutdown()
+
+def main():
+    parser = argparse.ArgumentParser(description="Watch folders and convert PDBXML/XML files to Excel (.xlsx) as they arrive")
+    parser.add_argument("watch_dirs", nargs="+", help="Folders to watch (searched recursively)")
+    parser.add_argument("-o", "--output", required=True, help="Folder the reports are written to, mirroring the watched tree")
+    parser.add_argument("--interval", type=float, default=1.0, help="Seconds between folder scans (default: 1)")
+    parser.add_argument("--settle", type=float, default=2.0, help="Seconds a file must stay unchanged before it is converted (default: 2)")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="Number of worker processes (default: CPU count)")
+    parser.add_argument("--no-graphs", action="store_true", help="Do not add voltage/impedance charts")
+    parser.add_argument("--once", action="store_true", help="Convert what is currently in the folders, then exit")
+    parser.add_argument("--metrics-json", default=None, help="Keep throughput/latency/failure metrics in this JSON file")
+    parser.add_argument("--metrics-prom", default=None, help="Keep the same metrics in this Prometheus text file")
+    parser.add_argument("--compression", default="default", choices=list(COMPRESSION_LEVELS), help="ZIP level of the reports: store and fast save quicker, max makes the smallest files (default: default)")
+
+    args = parser.parse_args()
+    for watch_dir in args.watch_dirs:
+        if not os.path.isdir(watch_dir):
+            print(f"Error: Folder '{watch_dir}' not found.")
+            return
+
+    print(f"Watching: {', '.join(args.watch_dirs)}")
+    try:
+        watch(args.watch_dirs, args.output, not args.no_graphs, args.interval, args.settle, args.jobs, args.once, args.metrics_json, args.metrics_prom, args.compression)
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
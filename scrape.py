@@ -1,39 +1,7 @@
-import xml.etree.ElementTree as ET
-import pandas as pd
 import tkinter as tk
 from tkinter import filedialog, messagebox
 import os
-
-# Function to parse XML and extract data into a DataFrame
-def parse_pdbxml(file_name, encoding='utf-8', namespace=None):
-    try:
-        tree = ET.parse(file_name, parser=ET.XMLParser(encoding=encoding))
-        root = tree.getroot()
-    except Exception as e:
-        messagebox.showerror("Error", f"Error loading XML file: {e}")
-        return None
-    
-    data = []
-    ns = { 'pdb': namespace } if namespace else {}
-
-    for form in root.findall("pdb:form", ns):
-        form_name = form.get("name")
-        for test in form.findall("pdb:test", ns):
-            row = {
-                "form_name": form_name,
-                "test_date": test.get("date"),
-                "resultsguid": test.get("resultsguid"),
-            }
-            for tag in test.find("pdb:data", ns).findall("pdb:tag", ns):
-                row[tag.get("name")] = tag.text if tag.text is not None else ""
-            for array in test.find("pdb:data", ns).findall("pdb:array", ns):
-                array_name = array.get("name")
-                row[array_name] = ", ".join(
-                    item.text for item in array.findall("pdb:arrayitem", ns) if item.text is not None
-                )
-            data.append(row)
-
-    return data
+from pdbxml_xlsx.csv_export import write_csv
 
 # Function to open the file dialog and set the file path
 def browse_file():
@@ -44,39 +12,46 @@ def browse_file():
 # Function to generate the CSV from the selected XML
 def generate_csv():
     file_path = file_entry.get()
-    encoding = encoding_entry.get() if encoding_entry.get() else "utf-8"
+    encoding = encoding_entry.get() or None
     namespace = namespace_entry.get()
 
     if not file_path:
         messagebox.showwarning("Input Error", "Please select a PDBXML file.")
         return
     
-    data = parse_pdbxml(file_path, encoding, namespace)
-    if data:
-        df = pd.DataFrame(data)
-        output_file = os.path.splitext(file_path)[0] + "_output.csv"
-        df.to_csv(output_file, index=False)
+    output_file = os.path.splitext(file_path)[0] + "_output.csv"
+    try:
+        count = write_csv(file_path, output_file, encoding, namespace)
+    except Exception as e:
+        if os.path.exists(output_file):
+            os.remove(output_file)
+        messagebox.showerror("Error", f"Error loading XML file: {e}")
+        return
+    if count:
         messagebox.showinfo("Success", f"CSV file generated: {output_file}")
+    else:
+        os.remove(output_file)
 
-# Set up the Tkinter window
-window = tk.Tk()
-window.title("PDBXML to CSV Converter")
+if __name__ == "__main__":
+    # Set up the Tkinter window
+    window = tk.Tk()
+    window.title("PDBXML to CSV Converter")
 
-# UI elements
-tk.Label(window, text="Select PDBXML File:").pack(pady=10)
-file_entry = tk.Entry(window, width=40)
-file_entry.pack(pady=5)
-tk.Button(window, text="Browse", command=browse_file).pack(pady=5)
+    # UI elements
+    tk.Label(window, text="Select PDBXML File:").pack(pady=10)
+    file_entry = tk.Entry(window, width=40)
+    file_entry.pack(pady=5)
+    tk.Button(window, text="Browse", command=browse_file).pack(pady=5)
 
-tk.Label(window, text="Encoding (Default: utf-8):").pack(pady=10)
-encoding_entry = tk.Entry(window, width=40)
-encoding_entry.pack(pady=5)
+    tk.Label(window, text="Encoding (Default: detected from file):").pack(pady=10)
+    encoding_entry = tk.Entry(window, width=40)
+    encoding_entry.pack(pady=5)
 
-tk.Label(window, text="Namespace (Optional):").pack(pady=10)
-namespace_entry = tk.Entry(window, width=40)
-namespace_entry.pack(pady=5)
+    tk.Label(window, text="Namespace (Optional):").pack(pady=10)
+    namespace_entry = tk.Entry(window, width=40)
+    namespace_entry.pack(pady=5)
 
-tk.Button(window, text="Generate CSV", command=generate_csv).pack(pady=20)
+    tk.Button(window, text="Generate CSV", command=generate_csv).pack(pady=20)
 
-# Run the Tkinter event loop
-window.mainloop()
\ No newline at end of file
+    # Run the Tkinter event loop
+    window.mainloop()
\ No newline at end of file
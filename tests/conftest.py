@@ -0,0 +1,8 @@
+import pytest
+
+from synthetic import write_variants
+
+@pytest.fixture(scope="session")
+def inputs(tmp_path_factory):
+    """{variant name: path} of test.PdbXml and the synthetic exports."""
+    return write_variants(str(tmp_path_factory.mktemp("inputs")))
@@ -0,0 +1,93 @@
+"""Golden output snapshots: workbooks are compared cell by cell through a JSON dump."""
+
+import csv
+import io
+import json
+import os
+
+from openpyxl import load_workbook
+
+GOLDEN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden")
+
+# Set PDBXML_UPDATE_GOLDEN=1 to rewrite the golden files from the current output.
+UPDATE = os.environ.get("PDBXML_UPDATE_GOLDEN") == "1"
+
+def workbook_snapshot(source):
+    """Values, bold cells, column widths and chart count of every sheet of a workbook."""
+    wb = load_workbook(io.BytesIO(source) if isinstance(source, bytes) else source)
+    sheets = []
+    for ws in wb.worksheets:
+        cells = []
+        for row in ws.iter_rows():
+            for cell in row:
+                if cell.value is not None or cell.font.b:
+                    cells.append([cell.coordinate, cell.value, bool(cell.font.b)])
+        sheets.append({
+            "title": ws.title,
+            "cells": cells,
+            "widths": {key: dim.width for key, dim in sorted(ws.column_dimensions.items()) if dim.width},
+            "charts": len(ws._charts),
+        })
+    return {"sheets": sheets}
+
+def csv_rows(source):
+    """Rows of a CSV file (path or bytes), for comparing CSV outputs."""
+    if isinstance(source, bytes):
+        text = source.decode("utf-8")
+    else:
+        with open(source, encoding="utf-8", newline="") as f:
+            text = f.read()
+    return list(csv.reader(io.StringIO(text)))
+
+def _dump(value, f):
+    """JSON with one workbook cell (or other innermost list) per line, for readable diffs."""
+    if isinstance(value, list) and value and isinstance(value[0], list):
+        f.write("[\n")
+        f.write(",\n".join(json.dumps(item, ensure_ascii=False) for item in value))
+        f.write("\n]")
+    elif isinstance(value, list):
+        f.write("[")
+        for i, item in enumerate(value):
+            f.write(",\n" if i else "\n")
+            _dump(item, f)
+        f.write("\n]")
+    elif isinstance(value, dict) and any(isinstance(item, (list, dict)) and item for item in value.values()):
+        f.write("{")
+        for i, (key, item) in enumerate(value.items()):
+            f.write(",\n" if i else "\n")
+            f.write(json.dumps(key, ensure_ascii=False) + ": ")
+            _dump(item, f)
+        f.write("\n}")
+    else:
+        f.write(json.dumps(value, ensure_ascii=False))
+
+def _path(name):
+    return os.path.join(GOLDEN_DIR, name)
+
+def check_json(name, snapshot):
+    """Asserts snapshot equals the golden JSON file, writing it instead in update mode."""
+    path = _path(name)
+    if UPDATE:
+        os.makedirs(GOLDEN_DIR, exist_ok=True)
+        with open(path, "w", encoding="utf-8", newline="\n") as f:
+            _dump(json.loads(json.dumps(snapshot)), f)
+            f.write("\n")
+        return
+    with open(path, encoding="utf-8") as f:
+        expected = json.load(f)
+    # Round-trip through JSON so tuples and lists compare alike.
+    assert json.loads(json.dumps(snapshot)) == expected, f"output differs from golden/{name}"
+
+def check_workbook(name, source):
+    check_json(name, workbook_snapshot(source))
+
+def check_csv(name, source):
+    """Asserts a CSV output matches golden/<name> row for row."""
+    path = _path(name)
+    if UPDATE:
+        os.makedirs(GOLDEN_DIR, exist_ok=True)
+        rows = csv_rows(source)
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            csv.writer(f, lineterminator="\n").writerows(rows)
+        return
+    assert csv_rows(source) == csv_rows(path), f"output differs from golden/{name}"
@@ -0,0 +1,86 @@
+"""Synthetic PDBXML exports built from the sample test in test.PdbXml."""
+
+import os
+import re
+from xml.sax.saxutils import escape
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE = os.path.join(ROOT, "test.PdbXml")
+
+TEST_BLOCK = re.compile(r"[ \t]*<test .*?</test>\r?\n", re.S)
+
+def sample_parts():
+    """Splits test.PdbXml into (text before the test, the test, text after it)."""
+    with open(SAMPLE, encoding="utf-8-sig") as f:
+        text = f.read()
+    match = TEST_BLOCK.search(text)
+    return text[:match.start()], match.group(0), text[match.end():]
+
+def set_tag(test, name, value):
+    """Replaces the text of every <tag name=...> of the test."""
+    return re.sub(rf'(<tag name="{name}" [^>]*>)[^<]*(</tag>)', lambda m: m.group(1) + escape(value) + m.group(2), test)
+
+def make_test(template, index, string, date, guid=None):
+    """A copy of the sample test with its own date, GUID, string and values."""
+    test = re.sub(r'date="[^"]*"', f'date="{date}"', template, count=1)
+    test = re.sub(r'resultsguid="[^"]*"', f'resultsguid="{guid or f"SYNTH{index:015d}"}"', test, count=1)
+    test = set_tag(test, "stringname", string)
+    test = set_tag(test, "instrbaselinez", f"0.2{index:02d}")
+    test = set_tag(test, "temperature", f"{20 + index}.5")
+    # Shift the voltages so every test has its own cell values.
+    return re.sub(
+        r'(<array name="voltage">.*?</array>)',
+        lambda m: re.sub(r">(\d+\.\d+)<", lambda v: f">{float(v.group(1)) + index / 100:.3f}<", m.group(1)),
+        test, count=1, flags=re.S,
+    )
+
+STRINGS = ("AMEX A1", "AMEX B2", "Site 3/Bank <C>")
+
+# TestFilter.build() arguments tried on the "multi" export, by golden name.
+FILTERS = {
+    "since": {"since": "2023-06-01"},
+    "until": {"until": "04/15/2023"},
+    "string": {"strings": ["amex b2"]},
+    "guid": {"guids": ["synth000000000000003", "SYNTH000000000000006"]},
+    "mixed": {"since": "2023-03-01", "until": "2023-10-31", "strings": ["AMEX A1", "AMEX B2"]},
+}
+
+def multi_export(first, count):
+    """count tests numbered from first, over three strings and out of date order."""
+    head, template, tail = sample_parts()
+    tests = []
+    for index in range(first, first + count):
+        date = f"{(index * 5) % 12 + 1:02d}/{index % 27 + 1:02d}/2023 0{index % 10}:15:00"
+        tests.append(make_test(template, index, STRINGS[index % 3], date))
+    return head + "".join(tests) + tail
+
+def sparse_export():
+    """The sample test without tem_1, instrbaselinez and formname, and with empty voltages."""
+    head, test, tail = sample_parts()
+    test = re.sub(r'\s*<array name="tem_1">.*?</array>', "", test, flags=re.S)
+    test = re.sub(r'\s*<tag name="(instrbaselinez|formname)" [^>]*>[^<]*</tag>', "", test)
+    test = re.sub(
+        r'(<array name="voltage">.*?</array>)',
+        lambda m: re.sub(r'(<arrayitem index="\d*[05]" [^>]*>)[^<]*', r"\1", m.group(1)),
+        test, count=1, flags=re.S,
+    )
+    return head + test + tail
+
+def write_variants(folder):
+    """Writes every input variant into folder and returns {name: path}."""
+    with open(SAMPLE, "rb") as f:
+        sample = f.read()
+    head, test, tail = sample_parts()
+    variants = {
+        "sample": sample,
+        "multi": multi_export(0, 8).encode("utf-8"),
+        "overlap": multi_export(5, 5).encode("utf-8"),
+        "utf16": (head + test + tail).replace('encoding="UTF-8"', 'encoding="UTF-16"').encode("utf-16"),
+        "sparse": sparse_export().encode("utf-8"),
+    }
+    paths = {}
+    for name, data in variants.items():
+        paths[name] = os.path.join(folder, f"{name}.PdbXml")
+        with open(paths[name], "wb") as f:
+            f.write(data)
+    return paths
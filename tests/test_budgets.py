@@ -0,0 +1,104 @@
+"""Time and peak-memory budgets per conversion stage.
+
+Budgets are for the 20-test synthetic export (about 12 MB) and leave
+roughly 4x headroom over a single-core development machine. Slower
+machines can scale them with PDBXML_BUDGET_SCALE=<factor>. Memory is the
+peak of Python allocations seen by tracemalloc, so it does not cover
+lxml's C buffers.
+"""
+
+import os
+import time
+import tracemalloc
+
+import pytest
+
+from synthetic import multi_export
+from pdbxml_xlsx import Warehouse, parse_xml
+from pdbxml_xlsx.csv_export import write_csv
+from pdbxml_xlsx.excel import type_test, write_excel
+from pdbxml_xlsx.reader import available_backends, iter_tests
+
+SCALE = float(os.environ.get("PDBXML_BUDGET_SCALE", "1"))
+MB = 1024 * 1024
+
+# stage: (seconds, peak MB)
+BUDGETS = {
+    "parse": (3.0, 16),
+    "type": (0.5, 8),
+    "write": (6.0, 48),
+    "csv": (5.0, 32),
+    "ingest": (3.0, 12),
+}
+
+def export_file(folder, count):
+    path = os.path.join(folder, f"budget{count}.PdbXml")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(multi_export(0, count))
+    return path
+
+@pytest.fixture(scope="module")
+def export(tmp_path_factory):
+    return export_file(str(tmp_path_factory.mktemp("budgets")), 20)
+
+def measure(run):
+    """Returns (seconds, peak bytes) of run(); timed without tracemalloc's overhead."""
+    start = time.perf_counter()
+    run()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    try:
+        run()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return elapsed, peak
+
+def check_budget(stage, run):
+    seconds, megabytes = BUDGETS[stage]
+    elapsed, peak = measure(run)
+    assert elapsed <= seconds * SCALE, f"{stage} took {elapsed:.2f}s, budget {seconds * SCALE:.2f}s"
+    assert peak <= megabytes * MB * SCALE, f"{stage} peaked at {peak / MB:.1f} MB, budget {megabytes * SCALE:.0f} MB"
+
+@pytest.mark.parametrize("backend", available_backends())
+def test_parse_budget(export, backend):
+    check_budget("parse", lambda: sum(1 for _ in iter_tests(export, backend)))
+
+def test_type_budget(export):
+    tests = parse_xml(export)[1]
+    check_budget("type", lambda: [type_test(test) for test in tests])
+
+def test_write_budget(export, tmp_path):
+    formname, tests = parse_xml(export)
+    check_budget("write", lambda: write_excel(formname, tests, True, str(tmp_path / "report.xlsx")))
+
+def test_csv_budget(export, tmp_path):
+    check_budget("csv", lambda: write_csv(export, str(tmp_path / "output.csv")))
+
+def test_ingest_budget(export, tmp_path):
+    def ingest():
+        warehouse = Warehouse(str(tmp_path / "warehouse.sqlite"))
+        try:
+            warehouse.ingest(export)
+        finally:
+            warehouse.close()
+    check_budget("ingest", ingest)
+
+@pytest.mark.parametrize("backend", available_backends())
+def test_parse_memory_does_not_grow_with_tests(tmp_path, backend):
+    # iter_tests keeps one test at a time, so four times the tests must not
+    # take noticeably more memory.
+    peaks = []
+    for count in (5, 20):
+        path = export_file(str(tmp_path), count)
+        peaks.append(measure(lambda: sum(1 for _ in iter_tests(path, backend)))[1])
+    assert peaks[1] <= peaks[0] * 1.5 + MB, f"peak grew from {peaks[0] / MB:.1f} MB to {peaks[1] / MB:.1f} MB"
+
+@pytest.mark.parametrize("backend", available_backends())
+def test_cell_keys_are_shared(export, backend):
+    # Names are interned by the reader, so all cells hold the same key objects.
+    keys = {}
+    for formname, test in iter_tests(export, backend):
+        for cell in test[1]:
+            for key in cell:
+                assert keys.setdefault(key, key) is key
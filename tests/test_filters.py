@@ -0,0 +1,48 @@
+from datetime import datetime
+
+import pytest
+
+from synthetic import FILTERS
+
+from pdbxml_xlsx import filters, parse_xml
+from pdbxml_xlsx.reader import available_backends
+
+def test_build_parses_dates():
+    test_filter = filters.TestFilter.build(since="2023-06-01", until="2023-06-30")
+    assert test_filter.since == datetime(2023, 6, 1)
+    # A date-only `until` takes in the whole day.
+    assert test_filter.until == datetime(2023, 6, 30, 23, 59, 59)
+    assert filters.TestFilter.build(until="2023-06-30 12:00").until == datetime(2023, 6, 30, 12, 0)
+    assert filters.TestFilter.build(since="06/01/2023").since == datetime(2023, 6, 1)
+    with pytest.raises(ValueError):
+        filters.TestFilter.build(since="yesterday")
+
+def test_accepts():
+    test_filter = filters.TestFilter.build(since="2023-06-01", until="2023-06-30", guids=["ABC"], forms=["Battery Test"], strings=["AMEX A1"])
+    assert test_filter.accepts_test("06/30/2023 23:00:00", "abc")
+    assert not test_filter.accepts_test("07/01/2023 00:00:00", "abc")
+    assert not test_filter.accepts_test("06/15/2023", "other")
+    # A test whose date cannot be read is not let through a date filter.
+    assert not test_filter.accepts_test("not a date", "abc")
+    assert test_filter.accepts_form("BATTERY TEST") and not test_filter.accepts_form(None)
+    assert test_filter.accepts_string("amex a1") and not test_filter.accepts_string("AMEX B2")
+    everything = filters.TestFilter()
+    assert everything.accepts_test(None, None) and everything.accepts_form(None) and everything.accepts_string(None)
+
+@pytest.mark.parametrize("backend", available_backends())
+@pytest.mark.parametrize("name", FILTERS)
+def test_filtered_parse_matches_filtering_afterwards(inputs, backend, name):
+    # Whatever the filter drops early (by byte scan, start tag or nameplate),
+    # the result must be the matching tests of a full parse, in order.
+    test_filter = filters.TestFilter.build(**FILTERS[name])
+    everything = parse_xml(inputs["multi"], backend)[1]
+    expected = [
+        test for index, test in enumerate(everything)
+        if test_filter.accepts_test(test[0]["Test Date"], f"SYNTH{index:015d}") and test_filter.accepts_string(test[2]["String Name"])
+    ]
+    assert 0 < len(expected) < len(everything)
+    assert parse_xml(inputs["multi"], backend, test_filter=test_filter)[1] == expected
+
+def test_form_filter(inputs):
+    assert parse_xml(inputs["multi"], test_filter=filters.TestFilter.build(forms=["no such form"]))[1] == []
+    assert len(parse_xml(inputs["multi"], test_filter=filters.TestFilter.build(forms=["10770m - battery imp cond test bite5"]))[1]) == 8
@@ -0,0 +1,199 @@
+"""Every converter against the golden outputs of test.PdbXml and its synthetic variants."""
+
+import importlib.util
+import json
+import os
+import zipfile
+
+import pytest
+from openpyxl import load_workbook
+
+from golden import check_csv, check_json, check_workbook, workbook_snapshot
+from synthetic import FILTERS, ROOT, make_test, sample_parts
+from pdbxml_xlsx import Options, Warehouse, consolidate, convert, convert_combined, convert_many, parse_xml
+from pdbxml_xlsx import filters, server
+from pdbxml_xlsx.consolidate import string_filename
+from pdbxml_xlsx.csv_export import parse_pdbxml, scan_schema, write_csv
+from pdbxml_xlsx.reader import available_backends
+from pdbxml_xlsx.split import parse_xml_parallel
+
+VARIANTS = ["sample", "multi", "utf16", "sparse"]
+
+def load_script(name):
+    """Imports one of the top-level scripts by file name (scrape-cmd.py is not a valid module name)."""
+    spec = importlib.util.spec_from_file_location(name.replace("-", "_"), os.path.join(ROOT, f"{name}.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+@pytest.mark.parametrize("variant", VARIANTS)
+@pytest.mark.parametrize("backend", available_backends())
+def test_convert(inputs, tmp_path, variant, backend):
+    output_file = convert(inputs[variant], str(tmp_path / "report.xlsx"), Options(backend=backend))
+    check_workbook(f"{variant}.xlsx.json", output_file)
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_convert_many(inputs, tmp_path, jobs):
+    output_files, failed = convert_many([inputs[variant] for variant in VARIANTS], str(tmp_path), jobs=jobs)
+    assert failed == {}
+    for variant, output_file in zip(VARIANTS, output_files):
+        check_workbook(f"{variant}.xlsx.json", output_file)
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_convert_many_archive(inputs, tmp_path, jobs):
+    archive = str(tmp_path / "reports.zip")
+    output_files, failed = convert_many([inputs[variant] for variant in VARIANTS], None, jobs=jobs, archive=archive)
+    assert failed == {}
+    # Nothing is written but the archive itself.
+    assert os.listdir(tmp_path) == ["reports.zip"]
+    with zipfile.ZipFile(archive) as z:
+        assert output_files == [f"{variant}.PdbXml_report.xlsx" for variant in VARIANTS]
+        # Worker processes add their members in the order they finish.
+        assert sorted(z.namelist()) == sorted(output_files)
+        for variant, name in zip(VARIANTS, output_files):
+            check_workbook(f"{variant}.xlsx.json", z.read(name))
+
+@pytest.mark.parametrize("compression, method", [("store", zipfile.ZIP_STORED), ("fast", zipfile.ZIP_DEFLATED), ("max", zipfile.ZIP_DEFLATED)])
+def test_compression(inputs, tmp_path, compression, method):
+    output_file = convert(inputs["multi"], str(tmp_path / "report.xlsx"), Options(compression=compression))
+    with zipfile.ZipFile(output_file) as z:
+        assert {info.compress_type for info in z.infolist()} == {method}
+    check_workbook("multi.xlsx.json", output_file)
+
+# Workbook goldens for a prefiltered (GUID) and a mixed filter; every filter
+# is compared with filtering a full parse in test_filters.py.
+@pytest.mark.parametrize("name", ["guid", "mixed"])
+@pytest.mark.parametrize("backend", available_backends())
+def test_convert_filtered(inputs, tmp_path, name, backend):
+    test_filter = filters.TestFilter.build(**FILTERS[name])
+    output_file = convert(inputs["multi"], str(tmp_path / "report.xlsx"), Options(backend=backend, test_filter=test_filter))
+    check_workbook(f"multi.{name}.xlsx.json", output_file)
+
+@pytest.mark.parametrize("name", FILTERS)
+def test_csv_and_server_filtered(inputs, tmp_path, name):
+    test_filter = filters.TestFilter.build(**FILTERS[name])
+    output_file = str(tmp_path / "output.csv")
+    write_csv(inputs["multi"], output_file, test_filter=test_filter)
+    check_csv(f"multi.{name}.scrape.csv", output_file)
+    check_csv(f"multi.{name}.server.csv", server.convert(read(inputs["multi"]), "csv", True, test_filter)[0])
+
+def test_parallel_split_matches_sequential(inputs):
+    assert parse_xml_parallel(inputs["multi"], jobs=2, min_tests=2) == parse_xml(inputs["multi"])
+
+def test_no_graphs(inputs, tmp_path):
+    output_file = convert(inputs["sample"], str(tmp_path / "report.xlsx"), Options(graphs=False))
+    check_workbook("sample.no-graphs.xlsx.json", output_file)
+
+@pytest.mark.parametrize("variant", VARIANTS)
+def test_server_renderers(inputs, variant):
+    data = read(inputs[variant])
+    check_workbook(f"{variant}.xlsx.json", server.convert(data, "xlsx", True)[0])
+    check_csv(f"{variant}.server.csv", server.convert(data, "csv", True)[0])
+
+def test_server_json(inputs):
+    check_json("sample.server.json", json.loads(server.convert(read(inputs["sample"]), "json", True)[0]))
+
+def test_warehouse_export(inputs, tmp_path):
+    warehouse = Warehouse(str(tmp_path / "warehouse.sqlite"))
+    try:
+        for variant in VARIANTS:
+            warehouse.ingest(inputs[variant])
+        # Loading a file again replaces its tests instead of adding to them.
+        warehouse.ingest(inputs["multi"])
+        output_files = warehouse.export(str(tmp_path))
+    finally:
+        warehouse.close()
+    assert len(output_files) == len(VARIANTS)
+    for output_file in output_files:
+        variant = os.path.basename(output_file).split(".")[0]
+        check_workbook(f"{variant}.xlsx.json", output_file)
+
+@pytest.mark.parametrize("guid_db", [False, True])
+def test_consolidate(inputs, tmp_path, guid_db):
+    guid_db = str(tmp_path / "guids.sqlite") if guid_db else None
+    output_files, failed = consolidate([inputs["multi"], inputs["overlap"], inputs["multi"]], str(tmp_path), guid_db=guid_db)
+    assert failed == {}
+    assert sorted(output_files) == ["AMEX A1", "AMEX B2", "Site 3/Bank <C>"]
+    for name, output_file in output_files.items():
+        assert os.path.basename(output_file) == string_filename(name)
+        check_workbook(f"consolidate.{string_filename(name)}.json", output_file)
+
+def test_consolidate_keeps_colliding_file_names_apart(tmp_path):
+    head, template, tail = sample_parts()
+    names = ["Bank A/1", "Bank A:1", "AMEX A1", "Amex A1"]
+    export = tmp_path / "collide.PdbXml"
+    export.write_text(head + "".join(make_test(template, index, name, "01/02/2023 10:00:00") for index, name in enumerate(names)) + tail, encoding="utf-8")
+    (tmp_path / "out").mkdir()
+    output_files, failed = consolidate([str(export)], str(tmp_path / "out"))
+    assert failed == {}
+    assert [os.path.basename(output_files[name]) for name in names] == [
+        "Bank A_1_report.xlsx", "Bank A_1 (2)_report.xlsx", "AMEX A1_report.xlsx", "Amex A1 (2)_report.xlsx",
+    ]
+    assert len(os.listdir(tmp_path / "out")) == 4
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_convert_combined(inputs, tmp_path, jobs):
+    bad = tmp_path / "bad.xml"
+    bad.write_text("<bad")
+    output_file, failed = convert_combined([inputs[variant] for variant in VARIANTS] + [str(bad)], str(tmp_path / "combined.xlsx"), jobs=jobs)
+    assert list(failed) == [str(bad)]
+    index, *sheets = workbook_snapshot(output_file)["sheets"]
+    # Every input's sheet is laid out exactly like its own report.
+    assert [sheet["title"] for sheet in sheets] == VARIANTS
+    for variant, sheet in zip(VARIANTS, sheets):
+        check_json(f"{variant}.xlsx.json", {"sheets": [dict(sheet, title="Battery Test")]})
+    # The failed file's status holds the parser's message, which varies by backend.
+    errors = [cell for cell in index["cells"] if str(cell[1]).startswith("Error: ")]
+    assert len(errors) == 1
+    index["cells"].remove(errors[0])
+    del index["widths"]["E"]
+    check_json("combined.index.json", {"sheets": [index]})
+    links = load_workbook(output_file)["Index"]
+    assert links["B4"].hyperlink.location == "'sample'!A1"
+
+@pytest.mark.parametrize("variant", VARIANTS)
+def test_scrape_csv(inputs, tmp_path, variant):
+    output_file = str(tmp_path / "output.csv")
+    write_csv(inputs[variant], output_file)
+    check_csv(f"{variant}.scrape.csv", output_file)
+    # With a schema registry, the second run takes its header from it.
+    for _ in range(2):
+        write_csv(inputs[variant], output_file, registry_path=str(tmp_path / "schemas.json"))
+        check_csv(f"{variant}.scrape.csv", output_file)
+
+@pytest.mark.parametrize("strings", [None, ["AMEX B2"]])
+def test_scan_schema_orders_columns_like_rows(tmp_path, strings):
+    # The header is the union of the row keys in order of appearance, as a
+    # DataFrame built from the rows had it: a test's tags before its arrays,
+    # wherever they are in <data>.
+    head, template, tail = sample_parts()
+    late = '<array name="late_array"><arrayitem index="1">1</arrayitem></array><tag name="late_tag" type="string">x</tag></data>'
+    tests = [make_test(template, 0, "AMEX A1", "01/02/2023 10:00:00"), make_test(template, 1, "AMEX B2", "01/03/2023 10:00:00")]
+    tests[1] = tests[1].replace("</data>", late, 1)
+    export = tmp_path / "late.PdbXml"
+    export.write_text(head + "".join(tests) + tail, encoding="utf-8")
+    test_filter = filters.TestFilter.build(strings=strings) if strings else None
+    columns = {}
+    for row in parse_pdbxml(str(export), test_filter=test_filter):
+        columns.update(dict.fromkeys(row))
+    assert scan_schema(str(export), test_filter=test_filter)[1] == list(columns)
+    assert list(columns).index("late_tag") < list(columns).index("late_array")
+
+def test_scrape_csv_does_not_depend_on_earlier_files(inputs, tmp_path):
+    for variant in VARIANTS:
+        write_csv(inputs[variant], str(tmp_path / f"{variant}.csv"))
+    for variant in VARIANTS:
+        check_csv(f"{variant}.scrape.csv", str(tmp_path / f"{variant}.csv"))
+
+@pytest.mark.parametrize("variant", VARIANTS)
+def test_scrape_cmd(inputs, tmp_path, variant):
+    # scrape-cmd.py keeps its own reader: first test only, <tag baselinez>
+    # for the baseline and the "tem" array for temperatures.
+    scrape_cmd = load_script("scrape-cmd")
+    output_file = str(tmp_path / "report.xlsx")
+    scrape_cmd.write_excel(*scrape_cmd.parse_xml(inputs[variant]), output_file)
+    check_workbook(f"{variant}.scrape-cmd.xlsx.json", output_file)
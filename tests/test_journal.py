@@ -0,0 +1,110 @@
+import shutil
+
+import pytest
+
+from pdbxml_xlsx import Journal, Options, convert_many
+from pdbxml_xlsx import filters, pipeline
+from pdbxml_xlsx.journal import options_key
+from pdbxml_xlsx.metrics import BatchMetrics
+
+def run(input_file, output_folder, journal_path, options=None):
+    """Converts input_file with the journal; returns (report paths, number of files skipped)."""
+    journal = Journal(journal_path)
+    metrics = BatchMetrics()
+    try:
+        output_files, failed = convert_many([input_file], str(output_folder), options, journal=journal, metrics=metrics)
+    finally:
+        journal.close()
+    assert failed == {}
+    return output_files, metrics.summary()["skipped"]
+
+@pytest.fixture
+def export(inputs, tmp_path):
+    path = tmp_path / "input.PdbXml"
+    shutil.copy(inputs["multi"], path)
+    return str(path)
+
+def test_resume_skips_unchanged_file(export, tmp_path):
+    journal = str(tmp_path / "journal.sqlite")
+    output_files, skipped = run(export, tmp_path, journal)
+    assert skipped == 0
+    assert run(export, tmp_path, journal) == (output_files, 1)
+
+def test_interrupted_batch_keeps_finished_files(export, tmp_path, monkeypatch):
+    exports = [export]
+    for number in range(2, 5):
+        exports.append(str(tmp_path / f"input{number}.PdbXml"))
+        shutil.copy(export, exports[-1])
+    save = pipeline._save
+    saved = []
+
+    def interrupt_fourth(*args):
+        if len(saved) == 3:
+            raise KeyboardInterrupt
+        saved.append(save(*args))
+        return saved[-1]
+
+    monkeypatch.setattr(pipeline, "_save", interrupt_fourth)
+    journal = Journal(str(tmp_path / "journal.sqlite"))
+    try:
+        with pytest.raises(KeyboardInterrupt):
+            convert_many(exports, str(tmp_path), journal=journal)
+    finally:
+        journal.close()
+    monkeypatch.setattr(pipeline, "_save", save)
+    journal = Journal(str(tmp_path / "journal.sqlite"))
+    metrics = BatchMetrics()
+    try:
+        output_files, failed = convert_many(exports, str(tmp_path), journal=journal, metrics=metrics)
+    finally:
+        journal.close()
+    assert failed == {} and len(output_files) == 4
+    assert metrics.summary()["skipped"] == 3
+
+@pytest.mark.parametrize("options", [
+    Options(graphs=False),
+    Options(compression="store"),
+    Options(backend="etree"),
+    Options(test_filter=filters.TestFilter.build(since="2023-06-01")),
+])
+def test_changed_options_are_converted_again(export, tmp_path, options):
+    journal = str(tmp_path / "journal.sqlite")
+    run(export, tmp_path, journal)
+    assert run(export, tmp_path, journal, options)[1] == 0
+    # The new settings are what is remembered now.
+    assert run(export, tmp_path, journal, options)[1] == 1
+
+def test_other_output_folder_is_converted_again(export, tmp_path):
+    journal = str(tmp_path / "journal.sqlite")
+    for name in ("a", "b"):
+        (tmp_path / name).mkdir()
+    run(export, tmp_path / "a", journal)
+    output_files, skipped = run(export, tmp_path / "b", journal)
+    assert skipped == 0
+    assert (tmp_path / "b" / "input.PdbXml_report.xlsx").exists()
+
+def test_changed_content_or_missing_report_is_converted_again(export, tmp_path):
+    journal = str(tmp_path / "journal.sqlite")
+    output_files, skipped = run(export, tmp_path, journal)
+    with open(export, "a", encoding="utf-8") as f:
+        f.write("\n")
+    assert run(export, tmp_path, journal)[1] == 0
+    (tmp_path / "input.PdbXml_report.xlsx").unlink()
+    assert run(export, tmp_path, journal)[1] == 0
+
+def test_filters_with_same_values_match():
+    # Name sets are compared as sorted lists, so their order does not matter.
+    first = Options(test_filter=filters.TestFilter.build(strings=["AMEX A1", "AMEX B2"]))
+    second = Options(test_filter=filters.TestFilter.build(strings=["amex b2", "AMEX A1"]))
+    assert options_key(first) == options_key(second)
+    assert options_key(first) != options_key(Options())
+
+def test_archive_is_refused_before_it_is_created(export, tmp_path):
+    journal = Journal(str(tmp_path / "journal.sqlite"))
+    archive = tmp_path / "reports.zip"
+    try:
+        with pytest.raises(ValueError):
+            convert_many([export], None, journal=journal, archive=str(archive))
+    finally:
+        journal.close()
+    assert not archive.exists()
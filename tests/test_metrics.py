@@ -0,0 +1,31 @@
+import json
+
+import pytest
+
+from pdbxml_xlsx import convert_many
+from pdbxml_xlsx.metrics import BatchMetrics, _percentile
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_batch_metrics(inputs, tmp_path, jobs):
+    bad = tmp_path / "bad.xml"
+    bad.write_text("<bad")
+    metrics = BatchMetrics()
+    output_files, failed = convert_many([inputs["sample"], inputs["multi"], str(bad)], str(tmp_path), jobs=jobs, metrics=metrics)
+    summary = metrics.summary()
+    assert (summary["files"], summary["failures"], summary["retries"]) == (2, 1, 2)
+    assert summary["tests"] == 9
+    assert summary["cells"] == 9 * 240
+    assert summary["bytes_out"] == sum((tmp_path / name).stat().st_size for name in ("sample.PdbXml_report.xlsx", "multi.PdbXml_report.xlsx"))
+    assert 0 < summary["latency_seconds"]["p50"] <= summary["latency_seconds"]["p95"] <= summary["latency_seconds"]["max"]
+
+    metrics.write_json(str(tmp_path / "metrics.json"))
+    assert json.loads((tmp_path / "metrics.json").read_text())["files"] == 2
+    metrics.write_prometheus(str(tmp_path / "metrics.prom"))
+    samples = dict(line.rsplit(" ", 1) for line in (tmp_path / "metrics.prom").read_text().splitlines() if not line.startswith("#"))
+    assert samples['pdbxml_files_total{status="failed"}'] == "1"
+    assert samples['pdbxml_file_latency_seconds_bucket{le="+Inf"}'] == samples["pdbxml_file_latency_seconds_count"] == "2"
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert (_percentile(values, 0.5), _percentile(values, 0.95), _percentile(values, 1.0)) == (50, 95, 100)
+    assert _percentile([], 0.5) is None
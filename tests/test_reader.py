@@ -0,0 +1,58 @@
+import pytest
+
+from synthetic import make_test, multi_export, sample_parts
+from pdbxml_xlsx import filters, parse_xml
+from pdbxml_xlsx.reader import available_backends
+from pdbxml_xlsx.source import FragmentReader, MappedSource
+from pdbxml_xlsx.split import parse_xml_parallel
+
+@pytest.fixture(scope="module")
+def export(tmp_path_factory):
+    path = tmp_path_factory.mktemp("reader") / "export.PdbXml"
+    path.write_text(multi_export(0, 12), encoding="utf-8")
+    return str(path)
+
+@pytest.mark.parametrize("backend", available_backends())
+@pytest.mark.parametrize("since, until", [("2023-06-01", None), (None, "2023-03-31"), ("2030-01-01", None)])
+def test_pruned_parse_matches_filtered_tests(export, backend, since, until):
+    # Date filters drop tests by byte scan before parsing; the result must
+    # be what filtering the fully parsed tests gives.
+    test_filter = filters.TestFilter.build(since=since, until=until)
+    formname, everything = parse_xml(export, backend)
+    expected = [test for test in everything if test_filter.accepts_test(test[0]["Test Date"], None)]
+    assert 0 < len(everything)
+    assert parse_xml(export, backend, test_filter=test_filter)[1] == expected
+
+@pytest.mark.parametrize("size", [1, 7, 4096, -1])
+def test_fragment_reader_streams_fragment(export, size):
+    with MappedSource(export) as source:
+        ranges = source.first_form_test_ranges()[2:5]
+        expected = source.fragment(ranges)
+        with FragmentReader(source, ranges) as reader:
+            chunks = iter(lambda: reader.read(size), b"")
+            assert b"".join(chunks) == expected
+
+@pytest.mark.parametrize("encoding", ["utf-8", "utf-16"])
+def test_byte_scan_skips_comments_and_cdata(tmp_path, encoding):
+    text = multi_export(0, 8)
+    head, template, tail = sample_parts()
+    commented = make_test(template, 99, "Commented", "01/01/2020 10:00:00")
+    # A commented-out test before the real ones, and a CDATA section
+    # holding an end tag inside the first of them.
+    form_start = text.index(">", text.index("<form")) + 1
+    text = text[:form_start] + f"<!-- {commented} -->" + text[form_start:]
+    text = text.replace('<tag name="topofpage" type="string"></tag>', '<tag name="topofpage" type="string"><![CDATA[</test>]]></tag>', 1)
+    path = tmp_path / "commented.PdbXml"
+    if encoding == "utf-16":
+        path.write_bytes(text.replace('encoding="UTF-8"', 'encoding="UTF-16"').encode("utf-16"))
+    else:
+        path.write_text(text, encoding="utf-8")
+    formname, everything = parse_xml(str(path))
+    assert len(everything) == 8
+    with MappedSource(str(path)) as source:
+        assert len(source.first_form_test_ranges()) == 8
+    assert parse_xml_parallel(str(path), 2, min_tests=2) == (formname, everything)
+    test_filter = filters.TestFilter.build(since="2019-01-01", until="2023-06-30")
+    expected = [test for test in everything if test_filter.accepts_test(test[0]["Test Date"], None)]
+    assert parse_xml(str(path), test_filter=test_filter)[1] == expected
+
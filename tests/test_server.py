@@ -0,0 +1,78 @@
+import http.client
+import os
+import signal
+import threading
+
+import pytest
+
+from synthetic import multi_export
+from pdbxml_xlsx.server import ConversionServer
+
+@pytest.fixture
+def server():
+    server = ConversionServer(("127.0.0.1", 0), jobs=1, backlog=2, timeout=60.0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def post(server, body, query="format=csv", headers=None):
+    connection = http.client.HTTPConnection(*server.server_address, timeout=60)
+    try:
+        connection.request("POST", f"/convert?{query}", body, headers or {})
+        response = connection.getresponse()
+        return response.status, response.read()
+    finally:
+        connection.close()
+
+def test_timeout_keeps_worker_taken(server):
+    data = multi_export(0, 40).encode("utf-8")
+    server.timeout = 0.001
+    assert post(server, data)[0] == 504
+    assert not server.workers.acquire(blocking=False)
+    # The next request waits for the abandoned conversion instead of
+    # sharing the only worker with it or failing.
+    server.timeout = 60.0
+    status, body = post(server, data)
+    assert status == 200 and body.startswith(b"Test Date,")
+    assert server.stats() == {"converted": 1, "failed": 1}
+
+def test_error_messages_go_in_the_body(server):
+    status, body = post(server, "<a Ω></a>".encode("utf-8"))
+    assert status == 422
+    assert "Ω" in body.decode("utf-8")
+    status, body = post(server, b"<a/>", "format=csv&since=%CE%A9")
+    assert (status, body.decode("utf-8")) == (400, "Unrecognised date 'Ω' (use YYYY-MM-DD)")
+
+def test_invalid_content_length(server):
+    connection = http.client.HTTPConnection(*server.server_address, timeout=60)
+    try:
+        connection.putrequest("POST", "/convert")
+        connection.putheader("Content-Length", "abc")
+        connection.endheaders()
+        response = connection.getresponse()
+        assert (response.status, response.read()) == (400, b"Invalid Content-Length")
+    finally:
+        connection.close()
+
+def test_dead_worker_is_replaced(server):
+    data = multi_export(0, 2).encode("utf-8")
+    assert post(server, data)[0] == 200
+    for process in list(server.pool._processes.values()):
+        os.kill(process.pid, signal.SIGKILL)
+    # Whether the death is noticed during this conversion or before it,
+    # the request is answered, and the one after is served by a new pool.
+    status, body = post(server, data)
+    assert status in (200, 500) and body
+    assert post(server, data)[0] == 200
+
+def test_full_queue_is_refused(server):
+    for _ in range(3):
+        assert server.slots.acquire(blocking=False)
+    try:
+        status, body = post(server, b"<a/>")
+        assert (status, body) == (503, b"Conversion queue is full")
+    finally:
+        for _ in range(3):
+            server.slots.release()
@@ -0,0 +1,54 @@
+import os
+import shutil
+import threading
+import time
+
+from pdbxml_xlsx import watch as watch_module
+from pdbxml_xlsx.pipeline import convert_file_counted
+from pdbxml_xlsx.watch import watch
+
+def die_first(input_file, output_file, options):
+    """convert_file_counted whose worker process dies the first time, like one killed for memory."""
+    marker = output_file + ".died"
+    if not os.path.exists(marker):
+        open(marker, "w").close()
+        os._exit(1)
+    return convert_file_counted(input_file, output_file, options)
+
+def test_once_converts_and_forgets_vanished_files(inputs, tmp_path):
+    incoming = tmp_path / "incoming"
+    incoming.mkdir()
+    shutil.copy(inputs["sample"], incoming / "sample.PdbXml")
+    # Deleted before it settles, like a temporary name renamed after copying.
+    (incoming / "partial.xml").write_text("<powerdb.testdata>")
+    thread = threading.Thread(target=watch, args=([str(incoming)], str(tmp_path / "out")), kwargs={"interval": 0.05, "settle": 1.0, "jobs": 1, "once": True}, daemon=True)
+    thread.start()
+    time.sleep(0.3)
+    os.remove(incoming / "partial.xml")
+    thread.join(timeout=30)
+    assert not thread.is_alive()
+    assert os.listdir(tmp_path / "out") == ["sample.PdbXml_report.xlsx"]
+
+def test_restart_skips_reports_newer_than_their_input(inputs, tmp_path):
+    incoming = tmp_path / "incoming"
+    incoming.mkdir()
+    shutil.copy(inputs["sample"], incoming / "sample.PdbXml")
+    report = tmp_path / "out" / "sample.PdbXml_report.xlsx"
+    watch([str(incoming)], str(tmp_path / "out"), interval=0.05, settle=0.1, jobs=1, once=True)
+    converted_at = os.stat(report).st_mtime_ns
+    watch([str(incoming)], str(tmp_path / "out"), interval=0.05, settle=0.1, jobs=1, once=True)
+    assert os.stat(report).st_mtime_ns == converted_at
+    # An input changed after its report was written is converted again.
+    later = os.stat(report).st_mtime + 10
+    os.utime(incoming / "sample.PdbXml", (later, later))
+    watch([str(incoming)], str(tmp_path / "out"), interval=0.05, settle=0.1, jobs=1, once=True)
+    assert os.stat(report).st_mtime_ns != converted_at
+
+def test_dead_worker_is_replaced(inputs, tmp_path, monkeypatch):
+    incoming = tmp_path / "incoming"
+    incoming.mkdir()
+    shutil.copy(inputs["sample"], incoming / "sample.PdbXml")
+    monkeypatch.setattr(watch_module, "convert_file_counted", die_first)
+    watch([str(incoming)], str(tmp_path / "out"), interval=0.05, settle=0.1, jobs=1, once=True)
+    assert sorted(os.listdir(tmp_path / "out")) == ["sample.PdbXml_report.xlsx", "sample.PdbXml_report.xlsx.died"]
+
@@ -0,0 +1,4 @@
+from pdbxml_xlsx.watch import main
+
+if __name__ == "__main__":
+    main()